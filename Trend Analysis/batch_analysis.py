@@ -0,0 +1,45 @@
+import argparse
+import time
+from src.pipeline import add_config_arguments, config_from_args, expand_inputs, run_batch
+from src.pipeline_stats import PipelineStats
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Headless trend analysis of many OHLC CSV files")
+    parser.add_argument('inputs', nargs='+', help="CSV files, directories or glob patterns")
+    parser.add_argument('-o', '--output', default='batch_results.json', help="Results JSON file")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="Worker processes (default: number of CPUs, 1 runs in-process)")
+    add_config_arguments(parser)
+    parser.add_argument('--stats', action='store_true',
+                        help="Collect stage timings and hot-path counters and print them per file")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config = config_from_args(args)
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print("No CSV files found.")
+        return
+
+    print(f"Analyzing {len(paths)} files...")
+    start = time.time()
+    results = run_batch(paths, config, workers=args.workers, output=args.output, collect_stats=args.stats)
+
+    for result in results:
+        if 'error' in result:
+            print(f"{result['symbol']}: ERROR {result['error']}")
+            continue
+        stats = result['trade_stats']
+        print(f"{result['symbol']}: {len(result['support_lines'])} support, "
+              f"{len(result['resistance_lines'])} resistance, "
+              f"{stats['total_trades']} trades, win rate {stats['win_rate']:.1f}%, "
+              f"P/L ${stats['total_pnl']:.2f}")
+        if args.stats:
+            print(PipelineStats.from_dict(result['stats']).report())
+
+    print(f"Done in {time.time() - start:.1f}s. Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
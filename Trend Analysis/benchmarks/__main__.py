@@ -0,0 +1,51 @@
+import argparse
+import pandas as pd
+from .suite import STAGES, BUNDLED_CSVS, run_suite, save_run, load_run, compare_runs
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time each analysis stage on synthetic series and the bundled CSV files")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[1000, 10000, 100000, 1000000],
+                        help="Bars of the synthetic series")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pivot-density', type=float, default=0.04,
+                        help="Approximate fraction of synthetic bars that are pivots")
+    parser.add_argument('--csv', nargs='*', default=BUNDLED_CSVS, help="CSV files to time (default: the bundled ones)")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage; the fastest is kept")
+    parser.add_argument('--max-event-lines', type=int, default=200,
+                        help="Lines checked one by one in the detect_events stage")
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help="Results JSON file")
+    parser.add_argument('--compare', default=None, help="Earlier results JSON file to compare with")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="Slowdown ratio reported as a regression, if also slower by more than --min-delta")
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help="Seconds a stage must slow down by to count as a regression (ignores timer noise)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    run = run_suite(args.sizes, args.seed, args.pivot_density, args.csv,
+                    stages=args.stages, repeat=args.repeat, max_event_lines=args.max_event_lines,
+                    progress=lambda name: print(f"Timing {name}...", flush=True))
+    save_run(run, args.output)
+
+    table = pd.DataFrame([{'dataset': result['dataset'], 'bars': result['bars'], **result['times']}
+                          for result in run['results']])
+    with pd.option_context('display.max_columns', None, 'display.width', 200, 'display.float_format', '{:.4f}'.format):
+        print(table.to_string(index=False))
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        comparison = compare_runs(run, load_run(args.compare), args.threshold, args.min_delta)
+        with pd.option_context('display.width', 200, 'display.float_format', '{:.4f}'.format):
+            print(f"\nCompared with {args.compare}:")
+            print(comparison.to_string(index=False))
+        regressions = comparison[comparison['regression']]
+        if regressions.empty:
+            print("No regressions.")
+        else:
+            print(f"{len(regressions)} stage times are more than {args.threshold:.2f}x "
+                  f"and {args.min_delta * 1000:.0f} ms slower.")
+
+if __name__ == "__main__":
+    main()
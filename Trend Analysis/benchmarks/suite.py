@@ -0,0 +1,181 @@
+import json
+import os
+import platform
+import time
+import numpy as np
+import pandas as pd
+from dataclasses import asdict
+from typing import Callable, List, Tuple, Dict, Optional
+from src.pipeline import AnalysisConfig
+from src.pivot_detection import get_pivot_points
+from src.trendline_detection import simple_trendlines, hough_transform_trendlines
+from src.trendline_events import detect_events
+from src.price_context import PriceContext
+from src.backtest import simulate_trades
+from src.utils import calculate_atr, load_data
+from .synthetic import synthetic_ohlc
+
+# Benchmark settings: the Hough ranges of main.py instead of the GUI's (10, 0)
+BENCHMARK_CONFIG = AnalysisConfig(method=2, future_pivot_ranges=(10, 25))
+BUNDLED_CSVS = [os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), name)
+                for name in ('data.csv', 'NSE_KALYANKJIL, 5.csv')]
+STAGES = ['get_pivot_points', 'calculate_atr', 'hough_transform_trendlines',
+          'simple_trendlines', 'detect_events', 'simulate_trades']
+
+def best_time(func: Callable[[], object], repeat: int = 3) -> Tuple[float, object]:
+    """Shortest wall time of repeat calls in seconds, and the result of the last call"""
+    best = float('inf')
+    result = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def time_stages(df: pd.DataFrame,
+                config: AnalysisConfig = BENCHMARK_CONFIG,
+                stages: Optional[List[str]] = None,
+                repeat: int = 3,
+                max_event_lines: int = 200) -> Dict:
+    """
+    Time each stage separately on df, in pipeline order, feeding every stage
+    the outputs of the earlier ones (computed untimed when a stage is skipped).
+
+    Trendline stages run on both sides. detect_events is timed on up to
+    max_event_lines of the lines found by simple_trendlines, evenly spread,
+    since checking every line one by one is quadratic in the number of bars.
+    simulate_trades backtests the Hough lines.
+    Returns the bar and pivot counts, stage times in seconds and line counts.
+    """
+    stages = STAGES if stages is None else stages
+    times = {}
+
+    def stage(name, func):
+        if name not in stages:
+            return func()
+        times[name], result = best_time(func, repeat)
+        return result
+
+    high_pivots, low_pivots = stage('get_pivot_points', lambda: get_pivot_points(df, window=config.window))
+    frame = df.copy()
+    frame['atr'] = stage('calculate_atr', lambda: calculate_atr(frame, config.atr_period))
+    ctx = PriceContext.from_df(frame, high_pivots, low_pivots)
+
+    def hough():
+        return tuple(
+            hough_transform_trendlines(pivots, frame, is_support, high_pivots=high_pivots, low_pivots=low_pivots,
+                                       future_pivot_ranges=list(config.future_pivot_ranges),
+                                       min_score=config.min_score, atr_multiplier=config.atr_multiplier,
+                                       ctx=ctx)
+            for pivots, is_support in ((low_pivots, True), (high_pivots, False))
+        )
+
+    def simple():
+        return tuple(
+            simple_trendlines(pivots, frame, is_support, high_pivots=high_pivots, low_pivots=low_pivots,
+                              atr_multiplier=config.atr_multiplier, ctx=ctx)
+            for pivots, is_support in ((low_pivots, True), (high_pivots, False))
+        )
+
+    hough_lines = stage('hough_transform_trendlines', hough) if (
+        'hough_transform_trendlines' in stages or 'simulate_trades' in stages) else ((), ())
+    simple_lines = stage('simple_trendlines', simple) if (
+        'simple_trendlines' in stages or 'detect_events' in stages) else ((), ())
+
+    event_lines = [((line[0], line[1], line[2]), is_support)
+                   for lines, is_support in zip(simple_lines, (True, False)) for line in lines]
+    if len(event_lines) > max_event_lines:
+        picks = np.linspace(0, len(event_lines) - 1, max_event_lines).astype(int)
+        event_lines = [event_lines[i] for i in picks]
+    if 'detect_events' in stages:
+        stage('detect_events', lambda: [
+            detect_events(line, frame, high_pivots, low_pivots, is_support, config.atr_multiplier, ctx=ctx)
+            for line, is_support in event_lines
+        ])
+
+    if 'simulate_trades' in stages:
+        stage('simulate_trades', lambda: simulate_trades(
+            frame, hough_lines[0], hough_lines[1],
+            reward_ratio=config.reward_ratio,
+            event_window=config.event_window,
+            atr_multiplier=config.trade_atr_multiplier,
+            risk_per_trade=config.risk_per_trade
+        ))
+
+    return {
+        'bars': len(df),
+        'high_pivots': len(high_pivots),
+        'low_pivots': len(low_pivots),
+        'times': times,
+        'hough_lines': sum(len(lines) for lines in hough_lines),
+        'simple_lines': sum(len(lines) for lines in simple_lines),
+        'event_lines': len(event_lines),
+    }
+
+def run_suite(sizes: List[int] = (1000, 10000, 100000, 1000000),
+              seed: int = 0,
+              pivot_density: float = 0.04,
+              csv_files: List[str] = BUNDLED_CSVS,
+              config: AnalysisConfig = BENCHMARK_CONFIG,
+              stages: Optional[List[str]] = None,
+              repeat: int = 3,
+              max_event_lines: int = 200,
+              progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Time the stages on synthetic series of the given sizes and on the CSV
+    files (missing files are skipped). Returns a JSON-friendly run record
+    with the environment, settings and one result per dataset.
+    """
+    datasets = [(f"synthetic-{n}", lambda n=n: synthetic_ohlc(n, seed=seed, pivot_density=pivot_density))
+                for n in sizes]
+    datasets += [(os.path.basename(path), lambda path=path: load_data(path, use_cache=False))
+                 for path in csv_files if os.path.isfile(path)]
+
+    results = []
+    for name, load in datasets:
+        if progress is not None:
+            progress(name)
+        result = {'dataset': name}
+        result.update(time_stages(load(), config, stages, repeat, max_event_lines))
+        results.append(result)
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        },
+        'settings': {'seed': seed, 'pivot_density': pivot_density, 'repeat': repeat,
+                     'max_event_lines': max_event_lines, 'config': asdict(config)},
+        'results': results,
+    }
+
+def save_run(run: Dict, path: str):
+    with open(path, 'w') as f:
+        json.dump(run, f, indent=2)
+
+def load_run(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+def compare_runs(run: Dict, baseline: Dict, threshold: float = 1.2, min_delta: float = 0.005) -> pd.DataFrame:
+    """
+    Stage times of run next to those of baseline for every dataset and stage
+    in both. ratio is run / baseline; regression marks ratios above threshold
+    that are also slower by more than min_delta seconds, so the noise of
+    sub-millisecond stages is not reported.
+    """
+    baseline_times = {result['dataset']: result['times'] for result in baseline['results']}
+    rows = []
+    for result in run['results']:
+        before = baseline_times.get(result['dataset'], {})
+        for stage, seconds in result['times'].items():
+            if stage in before:
+                ratio = seconds / before[stage] if before[stage] > 0 else float('inf')
+                rows.append({'dataset': result['dataset'], 'stage': stage, 'baseline': before[stage],
+                             'current': seconds, 'ratio': ratio,
+                             'regression': ratio > threshold and seconds - before[stage] > min_delta})
+    return pd.DataFrame(rows, columns=['dataset', 'stage', 'baseline', 'current', 'ratio', 'regression'])
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+def synthetic_ohlc(n_bars: int,
+                   seed: int = 0,
+                   start_price: float = 100.0,
+                   volatility: float = 0.002,
+                   regime_length: int = 500,
+                   trend_strength: float = 0.0002,
+                   pivot_density: float = 0.04,
+                   swing_amplitude: float = 2.0,
+                   start_epoch: int = 1_700_000_000,
+                   interval: int = 60) -> pd.DataFrame:
+    """
+    Seeded OHLC bars with the price and epoch columns of load_data.
+
+    The log close is the sum of
+    - a trend: regimes of about regime_length bars, each with a drift drawn
+      with standard deviation trend_strength and pulled back towards the
+      start price, so long series keep a realistic price range
+    - swings: a zigzag whose legs last about 1 / pivot_density bars and move
+      about swing_amplitude * volatility per bar, so roughly pivot_density
+      of all bars are pivots (at most one per pivot window)
+    - noise of standard deviation volatility on every bar
+    Open is the previous close; high and low extend the open-close range by
+    a random part of volatility.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Trend regimes of geometric length, each drifting away from or back to the start
+    regime_length = max(regime_length, 1)
+    lengths = rng.geometric(1 / regime_length, size=n_bars // regime_length * 2 + 2)
+    while lengths.sum() < n_bars:
+        lengths = np.concatenate([lengths, rng.geometric(1 / regime_length, size=len(lengths))])
+    drifts = np.empty(len(lengths))
+    level = 0.0
+    for i, (length, shock) in enumerate(zip(lengths, rng.normal(0.0, trend_strength, len(lengths)))):
+        drifts[i] = shock - level / (4 * length)
+        level += drifts[i] * length
+    trend = np.cumsum(np.repeat(drifts, lengths)[:n_bars])
+
+    # Zigzag between alternating high and low levels; every turn is a pivot
+    mean_leg = 1 / pivot_density
+    legs = np.maximum(np.round(rng.uniform(0.5, 1.5, int(n_bars / mean_leg) + 2) * mean_leg), 1)
+    turns = np.concatenate([[0], np.cumsum(legs)])
+    sides = np.where(np.arange(len(turns)) % 2 == 0, 1.0, -1.0)
+    levels = sides * rng.uniform(0.5, 1.5, len(turns)) * swing_amplitude * volatility * mean_leg / 2
+    swing = np.interp(np.arange(n_bars), turns, levels)
+
+    close = start_price * np.exp(trend + swing - swing[0] + rng.normal(0.0, volatility, n_bars))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    wick = np.abs(rng.normal(0.0, volatility, (2, n_bars))) * close
+
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + wick[0],
+        'low': np.minimum(open_, close) - wick[1],
+        'close': close,
+        'epoch': start_epoch + interval * np.arange(n_bars, dtype=np.int64),
+    })
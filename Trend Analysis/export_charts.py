@@ -0,0 +1,42 @@
+import argparse
+import time
+from src.pipeline import add_config_arguments, config_from_args, expand_inputs
+from src.chart_export import chart_jobs, export_charts
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render trend analysis charts of many OHLC CSV files to PNG/SVG without a display")
+    parser.add_argument('inputs', nargs='+', help="CSV files, directories or glob patterns")
+    parser.add_argument('-o', '--output-dir', default='charts', help="Directory for the chart files")
+    parser.add_argument('--format', choices=['png', 'svg'], default='png')
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="Worker processes (default: number of CPUs, 1 runs in-process)")
+    parser.add_argument('--window-size', type=int, default=None,
+                        help="Render one chart per window of this many bars instead of one per file")
+    parser.add_argument('--window-step', type=int, default=None,
+                        help="Bars between windows (default: --window-size)")
+    add_config_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config = config_from_args(args)
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print("No CSV files found.")
+        return
+
+    jobs = chart_jobs(paths, args.output_dir, args.format, args.window_size, args.window_step)
+    print(f"Rendering {len(jobs)} charts from {len(paths)} files...")
+    start = time.time()
+    results = export_charts(jobs, config, workers=args.workers, dpi=args.dpi)
+
+    failed = [result for result in results if 'error' in result]
+    for result in failed:
+        print(f"{result['output']}: ERROR {result['error']}")
+
+    print(f"Done in {time.time() - start:.1f}s. {len(results) - len(failed)} charts written to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,30 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
-from src.pivot_detection import get_pivot_points
-from src.trendline_detection import simple_trendlines, hough_transform_trendlines
+import queue
+import threading
+from dataclasses import replace
 from src.visualization import plot_analysis
-from src.utils import prepare_data_with_atr
+from src.utils import load_data
+from src.pipeline import AnalysisConfig, AnalysisCancelled, AnalysisSession
+from src.pipeline_stats import PipelineStats
+from src.stage_cache import StageCache
+from src.data_cache import source_hash
 import os
 
+# Status bar text for the progress steps reported by run_pipeline
+STEP_LABELS = {
+    'atr': "Calculating ATR",
+    'pivots': "Finding pivot points",
+    'candidates': "Finding Hough candidates",
+    'support candidates': "Voting support lines (pivots)",
+    'resistance candidates': "Voting resistance lines (pivots)",
+    'events': "Detecting trendlines",
+    'lines': "Filtering trendlines",
+    'support scoring': "Scoring support candidates",
+    'resistance scoring': "Scoring resistance candidates",
+    'trades': "Simulating trades",
+}
+
 class ModernUI(ttk.Style):
     """Custom style for a modern UI appearance"""
     def __init__(self):
@@ -48,7 +66,7 @@ class TrendAnalyzerGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Trend Analysis Tool")
-        self.root.geometry("800x800")
+        self.root.geometry("800x900")
         self.root.configure(bg="#f5f5f7")
         
         # Apply modern style
@@ -57,6 +75,18 @@ class TrendAnalyzerGUI:
         # Trading state variables
         self.current_trade = None
         
+        # Stage outputs of earlier runs, reused when file and parameters match:
+        # the session keeps the last run's stages in memory, the cache on disk
+        self.stage_cache = StageCache()
+        self.session = AnalysisSession(self.stage_cache)
+        self.loaded_data = None  # (path, source hash, DataFrame) of the last run
+        
+        # Background analysis state
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.progress_queue = queue.Queue()
+        self.plot_settings = {}
+        
         self.create_widgets()
     
     def create_tooltip(self, widget, text):
@@ -295,6 +325,29 @@ class TrendAnalyzerGUI:
                           "Risk Per Trade: Fixed dollar amount to risk per trade")
         self.create_tooltip(trading_card, trading_tooltip)
         
+        # Pipeline Statistics Card
+        stats_card = ttk.Frame(right_column, style='Card.TFrame', padding=15)
+        stats_card.pack(fill=tk.BOTH, expand=True, pady=10)
+        
+        stats_header = ttk.Label(stats_card, text="Pipeline Statistics", style='CardHeader.TLabel')
+        stats_header.pack(anchor=tk.W, pady=(0, 10))
+        
+        self.collect_stats = tk.BooleanVar(value=False)
+        ttk.Checkbutton(stats_card, text="Collect timings and counters",
+                        variable=self.collect_stats, style='Modern.TCheckbutton').pack(anchor=tk.W, pady=5)
+        
+        # Read-only report of the last run
+        self.stats_text = tk.Text(stats_card, height=8, width=48, font=('Consolas', 9),
+                                  relief='flat', background='#fafafa', wrap=tk.NONE)
+        self.stats_text.pack(fill=tk.BOTH, expand=True)
+        self.stats_text.configure(state=tk.DISABLED)
+        
+        stats_tooltip = ("Wall time per stage and side, Hough calls and accumulator cells,\n"
+                        "candidates per future pivot range, rejected and redundant lines,\n"
+                        "and the bars spanned by the lines in event detection.\n"
+                        "Stages reused from an earlier run are listed, not timed.")
+        self.create_tooltip(stats_card, stats_tooltip)
+        
         # Action buttons
         button_frame = ttk.Frame(main_container, style='Modern.TFrame')
         button_frame.pack(fill=tk.X, pady=15)
@@ -306,10 +359,20 @@ class TrendAnalyzerGUI:
                              font=('Segoe UI', 9))
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
         
+        # Progress of the current analysis step
+        self.progress_bar = ttk.Progressbar(main_container, mode='determinate', maximum=100)
+        self.progress_bar.pack(side=tk.BOTTOM, fill=tk.X, pady=(0, 5))
+        
         # Analyze button
-        analyze_button = ttk.Button(button_frame, text="Analyze", command=self.run_analysis, 
+        self.analyze_button = ttk.Button(button_frame, text="Analyze", command=self.run_analysis, 
+                                  style='Modern.TButton', padding=(20, 10))
+        self.analyze_button.pack(side=tk.LEFT)
+        
+        # Cancel button, enabled while an analysis is running
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_analysis,
                                   style='Modern.TButton', padding=(20, 10))
-        analyze_button.pack(side=tk.LEFT)
+        self.cancel_button.pack(side=tk.LEFT, padx=10)
+        self.cancel_button.state(['disabled'])
         
         # Exit button
         exit_button = ttk.Button(button_frame, text="Exit", command=self.root.destroy, 
@@ -317,24 +380,18 @@ class TrendAnalyzerGUI:
         exit_button.pack(side=tk.RIGHT)
         
     def run_analysis(self):
-        """Run the analysis with selected parameters"""
+        """Start the analysis with selected parameters in a background thread"""
+        if self.worker is not None and self.worker.is_alive():
+            return
         if not self.file_path.get():
             messagebox.showerror("Error", "Please select a data file first.")
             return
             
         try:
-            self.status_var.set("Loading data and calculating trendlines...")
-            self.root.update_idletasks()  # Update the UI to show status
-            
-            # Load and prepare data with ATR
-            df = pd.read_csv(self.file_path.get())
+            # Read the analysis parameters
             atr_period = int(self.atr_period.get())
             atr_multiplier = float(self.atr_multiplier.get())
-            df = prepare_data_with_atr(df, atr_period)
-            
-            # Get pivot points with specified window
             window = int(self.window_size.get())
-            high_pivots, low_pivots = get_pivot_points(df, window=window)
             
             # Get event window size
             try:
@@ -361,57 +418,28 @@ class TrendAnalyzerGUI:
             except ValueError:
                 risk_per_trade = 100.0  # Default if invalid input
             
-            self.status_var.set("Detecting trendlines...")
-            self.root.update_idletasks()  # Update the UI to show status
-            
-            # Calculate trendlines
-            if self.trendline_method.get() == 1:
-                # Use simple trendlines
-                support_lines = simple_trendlines(
-                    low_pivots, df, is_support=True,
-                    high_pivots=high_pivots, low_pivots=low_pivots,
-                    atr_multiplier=atr_multiplier
-                )
-                resistance_lines = simple_trendlines(
-                    high_pivots, df, is_support=False,
-                    high_pivots=high_pivots, low_pivots=low_pivots,
-                    atr_multiplier=atr_multiplier
-                )
-            else:
-                # Use Hough transform with specified ranges
+            config = AnalysisConfig(
+                method=self.trendline_method.get(),
+                window=window,
+                atr_period=atr_period,
+                atr_multiplier=atr_multiplier,
+                event_window=event_window,
+                reward_ratio=reward_ratio,
+                trade_atr_multiplier=atr_multiplier_trade,
+                risk_per_trade=risk_per_trade
+            )
+            if config.method != 1:
+                # Hough transform with specified ranges
                 try:
                     range1 = int(self.range1.get())
                     range2 = int(self.range2.get())
-                    future_pivot_ranges = [range1, range2]
                 except ValueError:
                     messagebox.showerror("Error", "Future pivot ranges must be valid numbers.")
                     return
-                
-                min_score = float(self.min_score.get())
-                
-                support_lines = hough_transform_trendlines(
-                    low_pivots, df, is_support=True,
-                    high_pivots=high_pivots, low_pivots=low_pivots,
-                    future_pivot_ranges=future_pivot_ranges,
-                    atr_multiplier=atr_multiplier,
-                    min_score=min_score
-                )
-                
-                resistance_lines = hough_transform_trendlines(
-                    high_pivots, df, is_support=False,
-                    high_pivots=high_pivots, low_pivots=low_pivots,
-                    future_pivot_ranges=future_pivot_ranges,
-                    atr_multiplier=atr_multiplier,
-                    min_score=min_score
-                )
-            
-            self.status_var.set("Generating visualization...")
-            self.root.update_idletasks()  # Update the UI to show status
+                config = replace(config, future_pivot_ranges=(range1, range2),
+                                 min_score=float(self.min_score.get()))
             
-            # Plot results with trading parameters
-            result = plot_analysis(
-                df, high_pivots, low_pivots, 
-                support_lines, resistance_lines,
+            self.plot_settings = dict(
                 show_trades=show_trades,
                 reward_ratio=reward_ratio,
                 pivot_window=window,
@@ -420,6 +448,103 @@ class TrendAnalyzerGUI:
                 risk_per_trade=risk_per_trade
             )
             
+            # Tk is not thread-safe: the worker only talks to the GUI through the queue
+            self.cancel_event.clear()
+            self.progress_queue = queue.Queue()
+            self.worker = threading.Thread(target=self.analysis_worker,
+                                           args=(self.file_path.get(), config, self.progress_queue,
+                                                 self.collect_stats.get()),
+                                           daemon=True)
+            self.analyze_button.state(['disabled'])
+            self.cancel_button.state(['!disabled'])
+            self.progress_bar['value'] = 0
+            self.status_var.set("Loading data...")
+            self.worker.start()
+            self.root.after(100, self.poll_analysis)
+            
+        except Exception as e:
+            self.status_var.set(f"Error: {str(e)}")
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+    
+    def analysis_worker(self, path, config, progress_queue, collect_stats=False):
+        """Load the data and run the pipeline off the Tk thread, posting progress and the result"""
+        def report(step, done, total):
+            if self.cancel_event.is_set():
+                raise AnalysisCancelled()
+            progress_queue.put(('progress', step, done, total))
+        
+        try:
+            data_key = source_hash(path)
+            if self.loaded_data is not None and self.loaded_data[:2] == (path, data_key):
+                df = self.loaded_data[2]
+            else:
+                df = load_data(path)
+                self.loaded_data = (path, data_key, df)
+            # Only the stages whose parameters changed since the last run are recomputed,
+            # e.g. new trade settings rerun just the backtest
+            analysis = self.session.run(df, config, data_key=data_key, progress=report,
+                                        stats=PipelineStats() if collect_stats else None)
+            progress_queue.put(('done', analysis))
+        except AnalysisCancelled:
+            progress_queue.put(('cancelled',))
+        except Exception as e:
+            progress_queue.put(('error', e))
+    
+    def poll_analysis(self):
+        """Show the worker's progress messages; finish once it reports a result"""
+        try:
+            while True:
+                message = self.progress_queue.get_nowait()
+                if message[0] != 'progress':
+                    self.finish_analysis(message)
+                    return
+                _, step, done, total = message
+                label = STEP_LABELS.get(step, step)
+                if total > 1:
+                    self.status_var.set(f"{label}... {done}/{total}")
+                else:
+                    self.status_var.set(f"{label}...")
+                self.progress_bar['value'] = 100.0 * done / total if total else 0
+        except queue.Empty:
+            pass
+        self.root.after(100, self.poll_analysis)
+    
+    def cancel_analysis(self):
+        """Ask the running analysis to stop at its next progress report"""
+        if self.worker is not None and self.worker.is_alive():
+            self.cancel_event.set()
+            self.cancel_button.state(['disabled'])
+            self.status_var.set("Cancelling...")
+    
+    def finish_analysis(self, message):
+        """Plot the result of a finished analysis, or report why it stopped"""
+        self.analyze_button.state(['!disabled'])
+        self.cancel_button.state(['disabled'])
+        self.progress_bar['value'] = 0
+        
+        if message[0] == 'cancelled':
+            self.status_var.set("Analysis cancelled.")
+            return
+        if message[0] == 'error':
+            e = message[1]
+            self.status_var.set(f"Error: {str(e)}")
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            return
+        
+        analysis = message[1]
+        self.show_stats(analysis.get('stats'))
+        try:
+            self.status_var.set("Generating visualization...")
+            self.root.update_idletasks()  # Update the UI to show status
+            
+            # Plot results with trading parameters
+            result = plot_analysis(
+                analysis['df'], analysis['high_pivots'], analysis['low_pivots'],
+                analysis['support_lines'], analysis['resistance_lines'],
+                trade_stats=analysis['trade_stats'],
+                **self.plot_settings
+            )
+            
             # Display trade statistics if available
             if result:
                 stats_message = (
@@ -436,10 +561,18 @@ class TrendAnalyzerGUI:
             self.status_var.set(f"Error: {str(e)}")
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
+    def show_stats(self, stats):
+        """Show the report of the last run in the statistics panel"""
+        text = stats.report() if stats is not None else "Statistics collection is off."
+        self.stats_text.configure(state=tk.NORMAL)
+        self.stats_text.delete('1.0', tk.END)
+        self.stats_text.insert(tk.END, text)
+        self.stats_text.configure(state=tk.DISABLED)
+
 def main():
     root = tk.Tk()
     app = TrendAnalyzerGUI(root)
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
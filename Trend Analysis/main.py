@@ -4,11 +4,12 @@ from src.pivot_detection import get_pivot_points
 from src.trendline_detection import simple_trendlines, hough_transform_trendlines
 from src.visualization import plot_analysis
 from src.hough_transform import hough_transform_from_point
+from src.utils import load_data
 
 def main():
     # Load data
     print("Loading data...")
-    df = pd.read_csv('data.csv')
+    df = load_data('data.csv')
     
      # Get user choice for methods
     
@@ -0,0 +1,50 @@
+import argparse
+import time
+import pandas as pd
+from src.pipeline import AnalysisConfig, add_config_arguments, config_from_args
+from src.sweep import SweepGrid, run_sweep
+from src.utils import load_data
+
+def parse_args():
+    defaults = AnalysisConfig()
+    parser = argparse.ArgumentParser(description="Rank trend analysis parameter combinations on one OHLC CSV file")
+    parser.add_argument('input', help="CSV file")
+    parser.add_argument('-o', '--output', default='sweep_results.csv', help="Ranked results CSV file")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="Worker processes (default: number of CPUs, 1 runs in-process)")
+    parser.add_argument('-n', '--top', type=int, default=10, help="Rows to print")
+    parser.add_argument('--windows', type=int, nargs='+', default=[defaults.window])
+    parser.add_argument('--atr-periods', type=int, nargs='+', default=[defaults.atr_period])
+    parser.add_argument('--atr-multipliers', type=float, nargs='+', default=[defaults.atr_multiplier])
+    parser.add_argument('--min-scores', type=float, nargs='+', default=[defaults.min_score])
+    parser.add_argument('--range1', type=int, nargs='+', default=[defaults.future_pivot_ranges[0]])
+    parser.add_argument('--range2', type=int, nargs='+', default=[defaults.future_pivot_ranges[1]])
+    # The swept parameters have the options above; the rest are fixed for every combination
+    add_config_arguments(parser, AnalysisConfig(method=2),
+                         ('method', 'event_window', 'reward_ratio', 'trade_atr_multiplier', 'risk_per_trade'))
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    grid = SweepGrid(
+        windows=tuple(args.windows),
+        atr_periods=tuple(args.atr_periods),
+        atr_multipliers=tuple(args.atr_multipliers),
+        min_scores=tuple(args.min_scores),
+        range1s=tuple(args.range1),
+        range2s=tuple(args.range2)
+    )
+    config = config_from_args(args)
+
+    df = load_data(args.input)
+    print(f"Running {grid.size(args.method)} combinations on {len(df)} bars...")
+    start = time.time()
+    table = run_sweep(df, grid, config, workers=args.workers)
+    table.to_csv(args.output, index=False)
+
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(table.head(args.top).to_string())
+    print(f"Done in {time.time() - start:.1f}s. Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
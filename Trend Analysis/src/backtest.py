@@ -0,0 +1,211 @@
+import pandas as pd
+import numpy as np
+from typing import List, Tuple, Dict, Optional
+from .trendline_events import TrendlineEvents
+
+TRADE_COLUMNS = ['entry_idx', 'entry_price', 'sl_price', 'tp_price', 'exit_idx', 'exit_price',
+                 'type', 'result', 'position_size', 'profit']
+
+class EntrySchedule:
+    """
+    Entry bars of all throwbacks (throwback index + event_window) as a sorted
+    array, with the side of the first throwback entering on each bar, which
+    is the only one a trade can be taken from
+    """
+    def __init__(self, entry_idx: np.ndarray, is_support: np.ndarray):
+        order = np.argsort(entry_idx, kind='stable')
+        entry_idx = np.asarray(entry_idx, dtype=np.int64)[order]
+        self.entry_idx, first = np.unique(entry_idx, return_index=True)
+        self.is_support = np.asarray(is_support, dtype=bool)[order][first]
+
+    @classmethod
+    def from_lines(cls, support_lines: List[Tuple],
+                   resistance_lines: List[Tuple],
+                   event_window: int = 3,
+                   confirm_window: int = 0) -> 'EntrySchedule':
+        """
+        Schedule of the throwbacks of all lines with events, support lines first.
+        A throwback is a pivot, known only confirm_window bars after it, so its
+        entry is at least that late; pass the pivot window to avoid lookahead.
+        """
+        entries, sides = [], []
+        for lines, is_support in ((support_lines, True), (resistance_lines, False)):
+            for line in lines:
+                if isinstance(line[3], TrendlineEvents) and line[3].throwbacks:
+                    throwbacks = np.fromiter(line[3].throwbacks, dtype=np.int64, count=len(line[3].throwbacks))
+                    entries.append(throwbacks + max(event_window, confirm_window))
+                    sides.append(np.full(len(throwbacks), is_support))
+        if not entries:
+            return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=bool))
+        return cls(np.concatenate(entries), np.concatenate(sides))
+
+    def __len__(self) -> int:
+        return len(self.entry_idx)
+
+    def next_entry(self, bar: int) -> int:
+        """Position of the first entry at or after bar"""
+        return int(np.searchsorted(self.entry_idx, bar, side='left'))
+
+    def between(self, start: int, stop: int) -> 'EntrySchedule':
+        """Schedule of the entries in bars [start, stop)"""
+        lo, hi = self.next_entry(start), self.next_entry(stop)
+        return EntrySchedule(self.entry_idx[lo:hi], self.is_support[lo:hi])
+
+def find_exit(high: np.ndarray,
+              low: np.ndarray,
+              entry_idx: int,
+              tp_price: float,
+              sl_price: float,
+              is_long: bool,
+              chunk_size: int = 64) -> Tuple[Optional[int], Optional[str]]:
+    """
+    First bar after entry_idx where the take profit or the stop loss is hit.
+    The take profit wins when both are hit on the same bar.
+    Searches forward in doubling chunks, so short trades only look at a few bars.
+    Returns (exit_idx, 'TP' | 'SL'), or (None, None) if neither is hit.
+    """
+    start = entry_idx + 1
+    while start < len(high):
+        stop = min(start + chunk_size, len(high))
+        if is_long:
+            tp_hit = high[start:stop] >= tp_price
+            sl_hit = low[start:stop] <= sl_price
+        else:
+            tp_hit = low[start:stop] <= tp_price
+            sl_hit = high[start:stop] >= sl_price
+        hit = tp_hit | sl_hit
+        if hit.any():
+            k = int(np.argmax(hit))
+            return start + k, 'TP' if tp_hit[k] else 'SL'
+        start = stop
+        chunk_size *= 2
+    return None, None
+
+def run_backtest(schedule: EntrySchedule,
+                 high: np.ndarray,
+                 low: np.ndarray,
+                 close: np.ndarray,
+                 atr: np.ndarray,
+                 reward_ratio: float = 2.0,
+                 atr_multiplier: float = 1.0,
+                 risk_per_trade: float = 100.0) -> List[Dict]:
+    """
+    Trade the scheduled entries one position at a time.
+
+    Each entry opens at the close of its entry bar if no position is
+    open: SHORT for support lines, LONG for resistance lines, with the stop
+    loss atr_multiplier * ATR and the take profit atr_multiplier *
+    reward_ratio * ATR away. A new position can open on the bar where the
+    previous one exits; entries falling inside an open position are skipped,
+    so after each exit the schedule jumps straight to the next free entry.
+    A position still open at the end is closed at the last close with
+    result 'OPEN'. Returns the completed trades.
+    """
+    tp_atr_multiplier = atr_multiplier * reward_ratio
+    n_bars = len(close)
+    completed_trades = []
+    pos = 0
+
+    while pos < len(schedule) and schedule.entry_idx[pos] < n_bars:
+        entry_idx = int(schedule.entry_idx[pos])
+        entry_price = close[entry_idx]
+        atr_value = atr[entry_idx]
+        if schedule.is_support[pos]:  # SHORT trade
+            sl_price = entry_price + (atr_value * atr_multiplier)
+            tp_price = entry_price - (atr_value * tp_atr_multiplier)
+            trade_type = 'SHORT'
+        else:  # LONG trade
+            sl_price = entry_price - (atr_value * atr_multiplier)
+            tp_price = entry_price + (atr_value * tp_atr_multiplier)
+            trade_type = 'LONG'
+
+        price_diff = abs(sl_price - entry_price)
+        if not price_diff > 0:
+            # No risk (or no ATR yet), skip the trade
+            pos += 1
+            continue
+        position_size = risk_per_trade / price_diff
+
+        exit_idx, result = find_exit(high, low, entry_idx, tp_price, sl_price, trade_type == 'LONG')
+        if result is None:
+            exit_idx, exit_price, result = n_bars - 1, close[-1], 'OPEN'
+            if trade_type == 'LONG':
+                price_diff = exit_price - entry_price
+            else:
+                price_diff = entry_price - exit_price
+        else:
+            exit_price = tp_price if result == 'TP' else sl_price
+            if trade_type == 'LONG':
+                price_diff = exit_price - entry_price
+            else:
+                price_diff = entry_price - exit_price
+
+        completed_trades.append({
+            'entry_idx': entry_idx,
+            'entry_price': entry_price,
+            'sl_price': sl_price,
+            'tp_price': tp_price,
+            'exit_idx': exit_idx,
+            'exit_price': exit_price,
+            'type': trade_type,
+            'result': result,
+            'position_size': position_size,
+            'profit': price_diff * position_size
+        })
+        if result == 'OPEN':
+            break
+        pos = schedule.next_entry(exit_idx)
+
+    return completed_trades
+
+def trade_stats(completed_trades: List[Dict]) -> Optional[Dict]:
+    """Summary of completed trades in the plot_analysis format, or None when there are none"""
+    if not completed_trades:
+        return None
+
+    total_pnl = 0.0
+    for trade in completed_trades:
+        total_pnl += trade['profit']
+    win_count = sum(1 for t in completed_trades if t['result'] == 'TP')
+    loss_count = sum(1 for t in completed_trades if t['result'] == 'SL')
+    win_rate = win_count / (win_count + loss_count) * 100 if (win_count + loss_count) > 0 else 0
+    return {
+        'trades': completed_trades,
+        'total_pnl': total_pnl,
+        'win_count': win_count,
+        'loss_count': loss_count,
+        'win_rate': win_rate
+    }
+
+def trades_frame(completed_trades: List[Dict]) -> pd.DataFrame:
+    """Trade table with one row per trade"""
+    return pd.DataFrame(completed_trades, columns=TRADE_COLUMNS)
+
+def simulate_trades(df: pd.DataFrame,
+                    support_lines: List[Tuple],
+                    resistance_lines: List[Tuple],
+                    reward_ratio: float = 2.0,
+                    event_window: int = 3,
+                    atr_multiplier: float = 1.0,
+                    risk_per_trade: float = 100.0) -> Optional[Dict]:
+    """
+    Backtest the throwbacks of the lines on df (needs an 'atr' column).
+
+    Returns the same dict as plot_analysis (trades, total_pnl, win_count,
+    loss_count, win_rate), or None when there are no trades.
+    """
+    schedule = EntrySchedule.from_lines(support_lines, resistance_lines, event_window)
+    if 'atr' not in df.columns or not len(schedule):
+        return None
+
+    completed_trades = run_backtest(
+        schedule,
+        df['high'].to_numpy(dtype=float),
+        df['low'].to_numpy(dtype=float),
+        df['close'].to_numpy(dtype=float),
+        df['atr'].to_numpy(dtype=float),
+        reward_ratio=reward_ratio,
+        atr_multiplier=atr_multiplier,
+        risk_per_trade=risk_per_trade
+    )
+    return trade_stats(completed_trades)
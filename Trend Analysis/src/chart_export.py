@@ -0,0 +1,95 @@
+import os
+import matplotlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Tuple, Dict, Optional
+from .pipeline import AnalysisConfig, run_pipeline, summarize_trades
+from .data_cache import cached_row_count
+from .utils import load_data
+
+# One chart: (source CSV, first bar, end bar or None for the whole file, output file)
+ChartJob = Tuple[str, int, Optional[int], str]
+
+def use_headless_backend():
+    """Switch matplotlib to the Agg backend, which renders files without a display"""
+    matplotlib.use('Agg', force=True)
+
+def chart_windows(n_bars: int, size: int, step: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    (start, end) of windows of size bars moved forward by step bars (default
+    size), plus a last window ending at the last bar if the steps miss it.
+    A series shorter than size is one window of all its bars.
+    """
+    step = step or size
+    windows = [(start, start + size) for start in range(0, n_bars - size + 1, step)]
+    if n_bars > 0 and (not windows or windows[-1][1] < n_bars):
+        windows.append((max(n_bars - size, 0), n_bars))
+    return windows
+
+def chart_jobs(paths: List[str],
+               output_dir: str,
+               fmt: str = 'png',
+               window_size: Optional[int] = None,
+               step: Optional[int] = None) -> List[ChartJob]:
+    """
+    One job per file, or with window_size one per window of every file.
+    Output files are <symbol>.<fmt> or <symbol>_<start>-<end>.<fmt> in output_dir.
+    Row counts come from the data cache metadata; a file is only parsed here
+    when it has no valid cache yet.
+    """
+    jobs = []
+    for path in paths:
+        symbol = os.path.splitext(os.path.basename(path))[0]
+        if window_size is None:
+            jobs.append((path, 0, None, os.path.join(output_dir, f"{symbol}.{fmt}")))
+            continue
+        for start, end in chart_windows(cached_row_count(path), window_size, step):
+            jobs.append((path, start, end, os.path.join(output_dir, f"{symbol}_{start}-{end}.{fmt}")))
+    return jobs
+
+def render_chart(job: ChartJob,
+                 config: AnalysisConfig = AnalysisConfig(),
+                 dpi: int = 100) -> Dict:
+    """Analyze the bars of one job and save its chart; errors are reported in the record instead of raised"""
+    # Imported here so the backend is chosen before pyplot is loaded
+    from .visualization import plot_analysis
+
+    path, start, end, output = job
+    symbol = os.path.splitext(os.path.basename(path))[0]
+    record = {'symbol': symbol, 'file': path, 'start': start, 'end': end, 'output': output}
+    try:
+        df = load_data(path)
+        if end is not None or start:
+            df = df.iloc[start:end].reset_index(drop=True)
+        result = run_pipeline(df, config)
+        title = symbol if end is None else f"{symbol} (bars {start}-{end})"
+        plot_analysis(result['df'], result['high_pivots'], result['low_pivots'],
+                      result['support_lines'], result['resistance_lines'],
+                      show_trades=True, trade_stats=result['trade_stats'],
+                      output=output, title=title, dpi=dpi)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+        return record
+
+    record['bars'] = len(result['df'])
+    record['total_trades'] = summarize_trades(result['trade_stats'])['total_trades']
+    return record
+
+def export_charts(jobs: List[ChartJob],
+                  config: AnalysisConfig = AnalysisConfig(),
+                  workers: Optional[int] = None,
+                  dpi: int = 100) -> List[Dict]:
+    """
+    Render many charts to files with the Agg backend in a process pool.
+    workers=1 renders in the current process, which is switched to Agg too.
+    Output directories are created as needed.
+    """
+    for directory in {os.path.dirname(output) for _, _, _, output in jobs}:
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    if workers == 1:
+        use_headless_backend()
+        return [render_chart(job, config, dpi) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=use_headless_backend) as executor:
+        return list(executor.map(render_chart, jobs, repeat(config), repeat(dpi)))
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+EPOCH_COLUMN = 'epoch'
+UNIX_EPOCH = pd.Timestamp(0, tz='UTC')
+
+@dataclass(frozen=True)
+class CsvFormat:
+    """Layout of an OHLC CSV file"""
+    name: str
+    time_column: str
+    # Exact strptime format of the time column, None to let pandas infer it
+    time_format: Optional[str]
+    # dtypes of the columns besides the prices and the time
+    extra_dtypes: Dict[str, str] = field(default_factory=dict)
+
+# data.csv: BOM, "timestamp" in dd/mm/yy H:MM
+TIMESTAMP_FORMAT = CsvFormat('timestamp', 'timestamp', '%d/%m/%y %H:%M')
+# TradingView exports such as NSE_KALYANKJIL, 5.csv: ISO "time", volume and opening range columns
+TRADINGVIEW_FORMAT = CsvFormat('tradingview', 'time', '%Y-%m-%dT%H:%M:%SZ',
+                               {'Volume': 'int64', 'ORB High': 'float64', 'ORB Low': 'float64'})
+KNOWN_FORMATS = [TIMESTAMP_FORMAT, TRADINGVIEW_FORMAT]
+TIME_COLUMN_NAMES = ['timestamp', 'time', 'date', 'datetime']
+
+def read_header(path: str) -> List[str]:
+    """Column names of a CSV file, without a UTF-8 byte order mark"""
+    with open(path, encoding='utf-8-sig') as f:
+        return [name.strip() for name in f.readline().rstrip('\r\n').split(',')]
+
+def detect_format(columns: List[str]) -> CsvFormat:
+    """
+    Format matching the header. Unknown layouts need the price columns and
+    fall back to an inferred time format if a time column is present.
+    """
+    missing = [name for name in PRICE_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"CSV is missing the price columns {missing}")
+
+    for fmt in KNOWN_FORMATS:
+        if columns and columns[0] == fmt.time_column and all(name in columns for name in fmt.extra_dtypes):
+            return fmt
+    time_column = next((name for name in TIME_COLUMN_NAMES if name in columns), None)
+    return CsvFormat('generic', time_column, None)
+
+def parse_epoch(times: pd.Series, time_format: Optional[str]) -> np.ndarray:
+    """Seconds since 1970-01-01 as int64; times without a zone are taken as UTC"""
+    parsed = pd.to_datetime(times, format=time_format, utc=True)
+    # Independent of the datetime64 unit pandas picks (ns, us or s)
+    return ((parsed - UNIX_EPOCH) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+
+def _to_epoch(value: Union[str, pd.Timestamp, int, None]) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return int((timestamp - UNIX_EPOCH) // pd.Timedelta(seconds=1))
+
+def read_ohlc(path: str,
+              nrows: Optional[int] = None,
+              start: Union[str, pd.Timestamp, int, None] = None,
+              end: Union[str, pd.Timestamp, int, None] = None,
+              price_dtype: Union[str, type] = np.float64,
+              chunksize: int = 1_000_000,
+              keep_time: bool = False) -> pd.DataFrame:
+    """
+    Read an OHLC CSV file in chunks of chunksize rows.
+
+    The layout is detected from the header. Prices get price_dtype (float64
+    or float32) and the other known columns their fixed dtypes. The time
+    column is parsed with its exact format into an int64 'epoch' column
+    (seconds, UTC). The text time column takes more memory than all numeric
+    columns, so it is dropped unless keep_time is set.
+    Only the rows with start <= time <= end are kept, up to nrows rows;
+    start and end are dates, Timestamps or epoch seconds. Rows must be in
+    time order when end is given, so reading stops at the first chunk past it.
+    Returns a DataFrame with a fresh RangeIndex.
+    """
+    columns = read_header(path)
+    fmt = detect_format(columns)
+    start_epoch, end_epoch = _to_epoch(start), _to_epoch(end)
+    if fmt.time_column is None and (start_epoch is not None or end_epoch is not None):
+        raise ValueError("A date range needs a time column")
+
+    dtypes = {name: price_dtype for name in PRICE_COLUMNS}
+    dtypes.update({name: dtype for name, dtype in fmt.extra_dtypes.items() if name in columns})
+    if fmt.time_column is not None:
+        dtypes[fmt.time_column] = str
+
+    chunks = []
+    n_rows = 0
+    reader = pd.read_csv(path, encoding='utf-8-sig', dtype=dtypes, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            past_end = False
+            if fmt.time_column is not None:
+                epoch = parse_epoch(chunk[fmt.time_column], fmt.time_format)
+                if not keep_time:
+                    chunk = chunk.drop(columns=fmt.time_column)
+                chunk[EPOCH_COLUMN] = epoch
+                keep = np.ones(len(chunk), dtype=bool)
+                if start_epoch is not None:
+                    keep &= epoch >= start_epoch
+                if end_epoch is not None:
+                    keep &= epoch <= end_epoch
+                    past_end = len(epoch) > 0 and epoch[-1] > end_epoch
+                if not keep.all():
+                    chunk = chunk[keep]
+
+            if nrows is not None and n_rows + len(chunk) >= nrows:
+                chunks.append(chunk.iloc[:nrows - n_rows])
+                break
+            chunks.append(chunk)
+            n_rows += len(chunk)
+            if past_end:
+                break
+
+    if not chunks:
+        empty = {name: pd.Series(dtype=dtype) for name, dtype in dtypes.items()
+                 if keep_time or name != fmt.time_column}
+        if fmt.time_column is not None:
+            empty[EPOCH_COLUMN] = pd.Series(dtype=np.int64)
+        return pd.DataFrame(empty)
+    return pd.concat(chunks, ignore_index=True)
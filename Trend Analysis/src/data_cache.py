@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+from .csv_loader import read_ohlc
+
+CACHE_VERSION = 3
+CACHE_DIR_NAME = '.ohlc_cache'
+META_FILE = 'meta.json'
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_path(source: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Directory holding the cache of a source file: by default
+    .ohlc_cache/<file name> next to the source
+    """
+    source = os.path.abspath(source)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(source), CACHE_DIR_NAME)
+    return os.path.join(cache_dir, os.path.basename(source))
+
+def _read_meta(directory: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == CACHE_VERSION else None
+
+def _write_meta(directory: str, meta: Dict):
+    # Write to a temporary file first so a crash never leaves a half-written sidecar
+    tmp = os.path.join(directory, META_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(directory, META_FILE))
+
+def is_cache_valid(source: str, meta: Optional[Dict]) -> bool:
+    """
+    True if the cache was built from the current contents of source. The
+    mtime and size are checked first; only when they changed is the file
+    hashed, so touching a file without editing it keeps its cache.
+    """
+    if meta is None:
+        return False
+    stat = os.stat(source)
+    if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+        return True
+    return meta['size'] == stat.st_size and meta['sha256'] == file_sha256(source)
+
+def source_hash(source: str, cache_dir: Optional[str] = None) -> str:
+    """SHA-256 of a source file, taken from its cache sidecar when that is still valid"""
+    meta = _read_meta(cache_path(source, cache_dir))
+    if meta is not None and is_cache_valid(source, meta):
+        return meta['sha256']
+    return file_sha256(source)
+
+def build_cache(source: str, df: pd.DataFrame, cache_dir: Optional[str] = None) -> Dict:
+    """
+    Write every column of df as one .npy file plus a meta.json sidecar
+    with the source's mtime, size and hash. Text columns are stored as
+    fixed-width unicode so they can be memory-mapped too.
+    """
+    directory = cache_path(source, cache_dir)
+    os.makedirs(directory, exist_ok=True)
+    stat = os.stat(source)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        values = df[name].to_numpy()
+        if values.dtype == object:
+            values = values.astype(str)
+        file_name = f'col{i}.npy'
+        np.save(os.path.join(directory, file_name), values, allow_pickle=False)
+        columns.append({'name': name, 'file': file_name, 'dtype': values.dtype.str})
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(source),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': file_sha256(source),
+        'rows': len(df),
+        'columns': columns,
+    }
+    _write_meta(directory, meta)
+    return meta
+
+def read_cache(directory: str, meta: Dict, mmap: bool = True) -> pd.DataFrame:
+    """
+    DataFrame over the cached columns. With mmap the numeric columns are
+    read-only memory maps of the .npy files, shared without copying.
+    """
+    mmap_mode = 'r' if mmap else None
+    data = {}
+    for column in meta['columns']:
+        values = np.load(os.path.join(directory, column['file']), mmap_mode=mmap_mode, allow_pickle=False)
+        if values.dtype.kind == 'U':
+            values = values.astype(object)
+        elif mmap:
+            # Plain ndarray view of the map, so pandas treats it like any array
+            values = values.view(np.ndarray)
+        data[column['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+def load_cached(source: str,
+                cache_dir: Optional[str] = None,
+                mmap: bool = True,
+                reader=read_ohlc) -> pd.DataFrame:
+    """
+    Load a CSV through its columnar cache. The file is parsed with reader
+    only when there is no valid cache for its current contents; later loads
+    memory-map the cached columns. If the cache can't be written the parsed
+    data is returned anyway.
+    """
+    directory = cache_path(source, cache_dir)
+    meta = _read_meta(directory)
+    if is_cache_valid(source, meta):
+        stat = os.stat(source)
+        if meta['mtime_ns'] != stat.st_mtime_ns:
+            # Same contents under a new mtime: skip hashing next time
+            meta['mtime_ns'] = stat.st_mtime_ns
+            try:
+                _write_meta(directory, meta)
+            except OSError:
+                pass
+        try:
+            return read_cache(directory, meta, mmap)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    df = reader(source)
+    try:
+        meta = build_cache(source, df, cache_dir)
+    except OSError as e:
+        warnings.warn(f"Could not write the data cache for {source}: {e}")
+        return df
+    return read_cache(directory, meta, mmap)
+
+def cached_row_count(source: str, cache_dir: Optional[str] = None) -> int:
+    """Number of rows of a CSV, read from its cache metadata (the cache is built if needed)"""
+    meta = _read_meta(cache_path(source, cache_dir))
+    if is_cache_valid(source, meta):
+        return meta['rows']
+    return len(load_cached(source, cache_dir))
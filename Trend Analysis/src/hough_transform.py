@@ -1,44 +1,133 @@
-
 import numpy as np
+from functools import lru_cache
+
+DISTANCE_THRESHOLD = 20
+MIN_VOTES = 1.5
+
+@lru_cache(maxsize=None)
+def get_theta_table(theta_resolution=1):
+    """
+    Theta grid with its cos/sin tables, computed once per resolution
+    """
+    thetas = np.deg2rad(np.arange(-89, 89, theta_resolution))
+    return thetas, np.cos(thetas), np.sin(thetas)
+
+def nearest_rho_index(max_rho, values, rho_resolution=1):
+    """
+    Index of the closest bin of np.arange(-max_rho, max_rho, rho_resolution)
+    for each value, without building the grid (lowest index wins ties, like np.argmin)
+    """
+    n_bins = np.ceil(2 * np.asarray(max_rho) / rho_resolution).astype(int)
+    left = np.floor((values + max_rho) / rho_resolution).astype(int)
+    left = np.clip(left, 0, n_bins - 1)
+    right = np.minimum(left + 1, n_bins - 1)
+    left_dist = np.abs(values - (-max_rho + left * rho_resolution))
+    right_dist = np.abs((-max_rho + right * rho_resolution) - values)
+    return np.where(left_dist <= right_dist, left, right)
 
 def hough_transform_from_point(main_point, other_points, theta_resolution=1, rho_resolution=1):
     """
      Hough Transform implementation
+
+     Only the accumulator row of the main point's rho is ever voted on, so the
+     votes are kept as one value per theta and computed for all points at once.
     """
     x_main, y_main = main_point
-    
+
     # Filter points that are to the right of the main point
     future_points = other_points[other_points[:, 0] > x_main]
-    
+
     if len(future_points) == 0:
         return None, None, 0
-        
-    max_rho = int(np.hypot(future_points[:, 0].max() - x_main, 
+
+    max_rho = int(np.hypot(future_points[:, 0].max() - x_main,
                           np.max(np.abs(future_points[:, 1] - y_main))))
-    
-    rhos = np.arange(-max_rho, max_rho, rho_resolution)
-    thetas = np.deg2rad(np.arange(-89, 89, theta_resolution))
-    
-    accumulator = np.zeros((len(rhos), len(thetas)))
-    
-    distance_threshold = 20
-    
-    for theta_idx, theta in enumerate(thetas):
-        main_rho = x_main * np.cos(theta) + y_main * np.sin(theta)
-        main_rho_idx = np.argmin(np.abs(rhos - main_rho))
-        
-        for x, y in future_points:
-            point_rho = x * np.cos(theta) + y * np.sin(theta)
-            distance = abs(point_rho - main_rho)
-            
-            if distance < distance_threshold:
-                vote_weight = 1.0 - (distance / distance_threshold)
-                accumulator[main_rho_idx, theta_idx] += vote_weight
-    
-    max_idx = np.unravel_index(np.argmax(accumulator), accumulator.shape)
-    rho_idx, theta_idx = max_idx
-    max_votes = accumulator[rho_idx, theta_idx]
-    
-    if max_votes > 1.5:
-        return thetas[theta_idx], rhos[rho_idx], max_votes
-    return None, None, 0
\ No newline at end of file
+
+    thetas, cos_t, sin_t = get_theta_table(theta_resolution)
+
+    # (points, thetas) distances of every point's rho to the main point's rho
+    main_rho = x_main * cos_t + y_main * sin_t
+    point_rho = future_points[:, 0:1] * cos_t + future_points[:, 1:2] * sin_t
+    distance = np.abs(point_rho - main_rho)
+
+    # Summing over axis 0 adds the points in order, same as the scalar loop
+    weights = np.where(distance < DISTANCE_THRESHOLD, 1.0 - (distance / DISTANCE_THRESHOLD), 0.0)
+    votes = weights.sum(axis=0)
+
+    # Pick the first maximum in (rho, theta) order, as argmax over the full accumulator would
+    max_votes = votes.max()
+    if max_votes > MIN_VOTES:
+        rho_idx = nearest_rho_index(max_rho, main_rho, rho_resolution)
+        candidates = np.flatnonzero(votes == max_votes)
+        theta_idx = candidates[np.argmin(rho_idx[candidates])]
+        return thetas[theta_idx], -max_rho + rho_idx[theta_idx] * rho_resolution, max_votes
+    return None, None, 0
+
+def hough_transform_batch(main_points, future_points, mask, theta_resolution=1, rho_resolution=1,
+                          max_cells=2 ** 22, stats=None):
+    """
+    Hough Transform for many main points at once
+
+    main_points: (N, 2) array of (x, y)
+    future_points: (N, K, 2) array of candidate points, padded per row
+    mask: (N, K) boolean array marking the real (non-padding) points
+
+    Gives the same (theta, rho, votes) per row as hough_transform_from_point,
+    with NaN theta/rho and 0 votes where no line was found. Rows are voted in
+    chunks of at most max_cells (rows x points x thetas) values.
+    stats: optional PipelineStats counting the rows and accumulator cells.
+    """
+    main_points = np.asarray(main_points, dtype=float)
+    future_points = np.asarray(future_points, dtype=float)
+    n_rows, n_points = mask.shape
+
+    thetas, cos_t, sin_t = get_theta_table(theta_resolution)
+    best_theta = np.full(n_rows, np.nan)
+    best_rho = np.full(n_rows, np.nan)
+    best_votes = np.zeros(n_rows)
+    if stats is not None:
+        stats.hough_batches += 1
+        stats.hough_calls += n_rows
+        stats.accumulator_cells += n_rows * n_points * len(thetas)
+    if n_rows == 0 or n_points == 0:
+        return best_theta, best_rho, best_votes
+
+    chunk = max(1, max_cells // (n_points * len(thetas)))
+    for start in range(0, n_rows, chunk):
+        rows = slice(start, start + chunk)
+        x_main = main_points[rows, 0:1]
+        y_main = main_points[rows, 1:2]
+        xs = future_points[rows, :, 0]
+        ys = future_points[rows, :, 1]
+
+        # Filter points that are to the right of the main point
+        valid = mask[rows] & (xs > x_main)
+        has_points = valid.any(axis=1)
+
+        max_dx = np.where(valid, xs - x_main, -np.inf).max(axis=1)
+        max_dy = np.where(valid, np.abs(ys - y_main), -np.inf).max(axis=1)
+        max_rho = np.floor(np.hypot(np.where(has_points, max_dx, 1), np.where(has_points, max_dy, 0)))
+
+        # (rows, points, thetas) distances to the main point's rho
+        main_rho = x_main * cos_t + y_main * sin_t
+        point_rho = xs[:, :, None] * cos_t + ys[:, :, None] * sin_t
+        distance = np.abs(point_rho - main_rho[:, None, :])
+
+        weights = np.where(valid[:, :, None] & (distance < DISTANCE_THRESHOLD),
+                           1.0 - (distance / DISTANCE_THRESHOLD), 0.0)
+        votes = weights.sum(axis=1)
+
+        # First maximum in (rho, theta) order for every row
+        max_votes = votes.max(axis=1)
+        rho_idx = nearest_rho_index(max_rho[:, None], main_rho, rho_resolution)
+        is_max = votes == max_votes[:, None]
+        theta_idx = np.argmin(np.where(is_max, rho_idx, np.iinfo(rho_idx.dtype).max), axis=1)
+        found = has_points & (max_votes > MIN_VOTES)
+
+        row_ids = np.arange(len(theta_idx))
+        best_idx = rho_idx[row_ids, theta_idx]
+        best_theta[rows] = np.where(found, thetas[theta_idx], np.nan)
+        best_rho[rows] = np.where(found, -max_rho + best_idx * rho_resolution, np.nan)
+        best_votes[rows] = np.where(found, max_votes, 0)
+
+    return best_theta, best_rho, best_votes
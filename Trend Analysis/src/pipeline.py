@@ -0,0 +1,391 @@
+import argparse
+import glob
+import json
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, fields
+from itertools import repeat
+from typing import Callable, Iterable, List, Tuple, Dict, Optional
+from .pivot_detection import get_pivot_points
+from .trendline_detection import (simple_trendlines, hough_candidates, score_hough_candidates,
+                                  filter_hough_lines)
+from .trendline_events import TrendlineEvents
+from .price_context import PriceContext
+from .backtest import simulate_trades
+from .stage_cache import StageCache, frame_hash
+from .pipeline_stats import PipelineStats, stats_timer
+from .utils import load_data, calculate_atr
+
+@dataclass(frozen=True)
+class AnalysisConfig:
+    """Parameters of one analysis run, with the GUI defaults"""
+    method: int = 1  # 1: linear regression, 2: Hough transform
+    window: int = 5
+    atr_period: int = 14
+    atr_multiplier: float = 0.4
+    min_score: float = 15.0
+    future_pivot_ranges: Tuple[int, ...] = (10, 0)
+    event_window: int = 3
+    reward_ratio: float = 2.0
+    trade_atr_multiplier: float = 2.0
+    risk_per_trade: float = 100.0
+
+# Command line options of the AnalysisConfig fields, keyed by field name;
+# the flag is --field-name unless given
+CONFIG_OPTIONS = {
+    'method': {'type': int, 'choices': [1, 2], 'help': "1: linear regression, 2: Hough transform"},
+    'window': {'type': int},
+    'atr_period': {'type': int},
+    'atr_multiplier': {'type': float},
+    'min_score': {'type': float},
+    'future_pivot_ranges': {'flag': '--ranges', 'metavar': 'RANGES', 'type': int, 'nargs': '+',
+                            'help': "Future pivot ranges for the Hough method"},
+    'event_window': {'type': int},
+    'reward_ratio': {'type': float},
+    'trade_atr_multiplier': {'type': float},
+    'risk_per_trade': {'type': float},
+}
+
+def add_config_arguments(parser: argparse.ArgumentParser,
+                         defaults: AnalysisConfig = AnalysisConfig(),
+                         names: Optional[Iterable[str]] = None):
+    """
+    Add the command line options of the AnalysisConfig fields (or only those
+    in names) to parser, defaulting to the values of defaults.
+    Each option is stored under its field name for config_from_args.
+    """
+    for name in (CONFIG_OPTIONS if names is None else names):
+        option = dict(CONFIG_OPTIONS[name])
+        flag = option.pop('flag', '--' + name.replace('_', '-'))
+        default = getattr(defaults, name)
+        parser.add_argument(flag, dest=name, default=list(default) if isinstance(default, tuple) else default,
+                            **option)
+
+def config_from_args(args: argparse.Namespace) -> AnalysisConfig:
+    """AnalysisConfig of the options added by add_config_arguments; fields without an option keep their default"""
+    values = {field.name: getattr(args, field.name) for field in fields(AnalysisConfig) if hasattr(args, field.name)}
+    if 'future_pivot_ranges' in values:
+        values['future_pivot_ranges'] = tuple(values['future_pivot_ranges'])
+    return AnalysisConfig(**values)
+
+class AnalysisCancelled(Exception):
+    """Raised by a progress callback to stop run_pipeline"""
+
+# Pipeline stages in dependency order, each with the stages its output depends on
+STAGE_DEPENDENCIES = {
+    'atr': (),
+    'pivots': (),
+    'candidates': ('pivots',),
+    'events': ('atr', 'pivots', 'candidates'),
+    'lines': ('events',),
+    'trades': ('atr', 'lines'),
+}
+# Cheap stages (min-score filtering) are only memoized in memory
+DISK_CACHED_STAGES = {'atr', 'pivots', 'candidates', 'events', 'trades'}
+
+def _own_params(config: AnalysisConfig) -> Dict[str, Dict]:
+    """Parameters each stage uses itself; the linear regression method has no candidates or score filter"""
+    hough = config.method != 1
+    return {
+        'atr': {'atr_period': config.atr_period},
+        'pivots': {'window': config.window},
+        'candidates': ({'method': config.method, 'future_pivot_ranges': list(config.future_pivot_ranges)}
+                       if hough else {'method': config.method}),
+        'events': {'method': config.method, 'atr_multiplier': config.atr_multiplier},
+        'lines': {'min_score': config.min_score} if hough else {},
+        'trades': {'event_window': config.event_window, 'reward_ratio': config.reward_ratio,
+                   'trade_atr_multiplier': config.trade_atr_multiplier,
+                   'risk_per_trade': config.risk_per_trade},
+    }
+
+def stage_params(config: AnalysisConfig) -> Dict[str, Dict]:
+    """Parameters each pipeline stage depends on: its own plus those of all upstream stages"""
+    own = _own_params(config)
+    params = {}
+    for name, dependencies in STAGE_DEPENDENCIES.items():
+        merged = {}
+        for dependency in dependencies:
+            merged.update(params[dependency])
+        merged.update(own[name])
+        params[name] = merged
+    return params
+
+def _compute_stage(name: str, df: pd.DataFrame, config: AnalysisConfig, inputs: Dict, report,
+                   stats: Optional[PipelineStats] = None) -> object:
+    """
+    Output of one stage from the prepared DataFrame and its dependencies' outputs.
+    Stages with a support and a resistance part time each side in stats.
+    """
+    if name == 'atr':
+        return calculate_atr(df, config.atr_period)
+    if name == 'pivots':
+        return get_pivot_points(df, window=config.window)
+
+    if name == 'candidates':
+        if config.method == 1:
+            return None
+        high_pivots, low_pivots = inputs['pivots']
+        ranges = list(config.future_pivot_ranges)
+        close = df['close'].to_numpy(dtype=float)
+        with stats_timer(stats, 'candidates/support'):
+            support = hough_candidates(low_pivots, close, high_pivots, low_pivots, ranges,
+                                       progress=report('support candidates'), stats=stats)
+        with stats_timer(stats, 'candidates/resistance'):
+            resistance = hough_candidates(high_pivots, close, high_pivots, low_pivots, ranges,
+                                          progress=report('resistance candidates'), stats=stats)
+        return support, resistance
+
+    if name == 'events':
+        high_pivots, low_pivots = inputs['pivots']
+        ctx = PriceContext.from_df(df, high_pivots, low_pivots)
+        if config.method == 1:
+            with stats_timer(stats, 'events/support'):
+                support = simple_trendlines(low_pivots, df, is_support=True,
+                                            high_pivots=high_pivots, low_pivots=low_pivots,
+                                            atr_multiplier=config.atr_multiplier, ctx=ctx, stats=stats)
+            with stats_timer(stats, 'events/resistance'):
+                resistance = simple_trendlines(high_pivots, df, is_support=False,
+                                               high_pivots=high_pivots, low_pivots=low_pivots,
+                                               atr_multiplier=config.atr_multiplier, ctx=ctx, stats=stats)
+            return support, resistance
+        candidates = inputs['candidates']
+        with stats_timer(stats, 'events/support'):
+            support = score_hough_candidates(candidates[0], low_pivots, df, True, config.atr_multiplier, ctx=ctx,
+                                             progress=report('support scoring'), stats=stats)
+        with stats_timer(stats, 'events/resistance'):
+            resistance = score_hough_candidates(candidates[1], high_pivots, df, False, config.atr_multiplier,
+                                                ctx=ctx, progress=report('resistance scoring'), stats=stats)
+        return support, resistance
+
+    if name == 'lines':
+        if config.method == 1:
+            return inputs['events']
+        scored_support, scored_resistance = inputs['events']
+        with stats_timer(stats, 'lines/support'):
+            support = filter_hough_lines(scored_support, config.min_score, stats=stats)
+        with stats_timer(stats, 'lines/resistance'):
+            resistance = filter_hough_lines(scored_resistance, config.min_score, stats=stats)
+        return support, resistance
+
+    if name == 'trades':
+        support_lines, resistance_lines = inputs['lines']
+        return simulate_trades(
+            df, support_lines, resistance_lines,
+            reward_ratio=config.reward_ratio,
+            event_window=config.event_window,
+            atr_multiplier=config.trade_atr_multiplier,
+            risk_per_trade=config.risk_per_trade
+        )
+    raise ValueError(f"Unknown stage {name!r}")
+
+class AnalysisSession:
+    """
+    Memoized pipeline stages for repeated runs on the same data.
+
+    The latest output of every stage is kept in memory under a key made of
+    the data hash and the stage's parameters, which include all upstream
+    parameters (see STAGE_DEPENDENCIES). A rerun only recomputes the stages
+    whose key changed: a new reward ratio only reruns the trades, a new
+    min score re-filters the already scored lines. Missing stages are looked
+    up in the optional on-disk StageCache before being computed.
+    Reused stages add nothing to the counters of a PipelineStats passed to
+    run; they are listed in its cached_stages.
+    """
+    def __init__(self, cache: Optional[StageCache] = None):
+        self.cache = cache
+        self.memo: Dict[str, Tuple[str, object]] = {}
+        self.computed: List[str] = []  # Stages computed or loaded from disk by the last run
+
+    def run(self, df: pd.DataFrame,
+            config: AnalysisConfig = AnalysisConfig(),
+            data_key: Optional[str] = None,
+            progress: Optional[Callable[[str, int, int], None]] = None,
+            stats: Optional[PipelineStats] = None) -> Dict:
+        """Same as run_pipeline, reusing the stages of earlier runs"""
+        params = stage_params(config)
+        if data_key is None:
+            data_key = frame_hash(df)
+        self.computed = []
+        values = {}
+
+        def report(step):
+            if progress is None:
+                return None
+            progress(step, 0, 1)
+            return lambda done, total: progress(step, done, total)
+
+        def get(name):
+            if name in values:
+                return values[name]
+            key = StageCache.key(data_key, name, params[name])
+            memo = self.memo.get(name)
+            if memo is not None and memo[0] == key:
+                values[name] = memo[1]
+                if stats is not None:
+                    stats.cached_stages.append(name)
+                return memo[1]
+
+            report(name)
+            computed = []
+
+            def compute():
+                # Dependencies are only evaluated when the stage itself has to run
+                inputs = {dependency: get(dependency) for dependency in STAGE_DEPENDENCIES[name]}
+                computed.append(name)
+                with stats_timer(stats, name):
+                    return _compute_stage(name, frame, config, inputs, report, stats)
+
+            if self.cache is not None and name in DISK_CACHED_STAGES:
+                value = self.cache.get_or_compute(data_key, name, params[name], compute)
+            else:
+                value = compute()
+            if stats is not None and not computed:
+                stats.cached_stages.append(name)
+            self.memo[name] = (key, value)
+            self.computed.append(name)
+            values[name] = value
+            return value
+
+        frame = df.copy()
+        frame['atr'] = get('atr')
+        high_pivots, low_pivots = get('pivots')
+        support_lines, resistance_lines = get('lines')
+        trade_stats = get('trades')
+
+        result = {
+            'df': frame,
+            'high_pivots': high_pivots,
+            'low_pivots': low_pivots,
+            'support_lines': support_lines,
+            'resistance_lines': resistance_lines,
+            'trade_stats': trade_stats
+        }
+        if stats is not None:
+            result['stats'] = stats
+        return result
+
+def run_pipeline(df: pd.DataFrame,
+                 config: AnalysisConfig = AnalysisConfig(),
+                 cache: Optional[StageCache] = None,
+                 data_key: Optional[str] = None,
+                 progress: Optional[Callable[[str, int, int], None]] = None,
+                 stats: Optional[PipelineStats] = None) -> Dict:
+    """
+    Run pivots -> ATR -> trendlines -> events -> trades on one DataFrame.
+    Returns the prepared DataFrame, pivots, lines and trade statistics.
+
+    With a StageCache every stage output is stored under data_key (the
+    source file hash, or a hash of the prices if not given) and the stage
+    parameters, so a rerun only computes the stages whose parameters changed.
+
+    progress is called with (step, done, total) at the start of every stage
+    and while candidates are found and scored. It runs in the caller's
+    thread and may raise (e.g. AnalysisCancelled) to stop the run.
+
+    With a PipelineStats the stage and side timings and the hot-path
+    counters are collected into it, and it is returned under 'stats'.
+    """
+    if cache is None and data_key is None:
+        data_key = ''  # Nothing is shared, so the prices need no hash
+    return AnalysisSession(cache).run(df, config, data_key=data_key, progress=progress, stats=stats)
+
+def lines_to_records(lines: List[Tuple]) -> List[Dict]:
+    """Convert (slope, intercept, start, events) lines to JSON-friendly dicts"""
+    records = []
+    for slope, intercept, start, events in lines:
+        record = {'slope': float(slope), 'intercept': float(intercept), 'start': int(start)}
+        if isinstance(events, TrendlineEvents):
+            record.update({
+                'touches': sorted(int(i) for i in events.touches),
+                'breakouts': sorted(int(i) for i in events.breakouts),
+                'throwbacks': sorted(int(i) for i in events.throwbacks),
+                'false_breakouts': sorted(int(i) for i in events.false_breakouts),
+            })
+            if events.breakout_point is not None:
+                record['breakout_point'] = int(events.breakout_point)
+        records.append(record)
+    return records
+
+def summarize_trades(trade_stats: Optional[Dict]) -> Dict:
+    """Trade statistics with zeros when there were no trades"""
+    if not trade_stats:
+        return {'total_trades': 0, 'win_count': 0, 'loss_count': 0, 'win_rate': 0.0,
+                'total_pnl': 0.0, 'trades': []}
+    return {
+        'total_trades': len(trade_stats['trades']),
+        'win_count': trade_stats['win_count'],
+        'loss_count': trade_stats['loss_count'],
+        'win_rate': float(trade_stats['win_rate']),
+        'total_pnl': float(trade_stats['total_pnl']),
+        'trades': trade_stats['trades'],
+    }
+
+def analyze_file(path: str, config: AnalysisConfig = AnalysisConfig(), collect_stats: bool = False) -> Dict:
+    """
+    Analyze one CSV file; errors are reported in the record instead of raised.
+    With collect_stats the record holds the PipelineStats dict under 'stats'.
+    """
+    symbol = os.path.splitext(os.path.basename(path))[0]
+    stats = PipelineStats() if collect_stats else None
+    try:
+        result = run_pipeline(load_data(path), config, stats=stats)
+    except Exception as e:
+        return {'symbol': symbol, 'file': path, 'error': f"{type(e).__name__}: {e}"}
+
+    record = {
+        'symbol': symbol,
+        'file': path,
+        'bars': len(result['df']),
+        'high_pivots': len(result['high_pivots']),
+        'low_pivots': len(result['low_pivots']),
+        'support_lines': lines_to_records(result['support_lines']),
+        'resistance_lines': lines_to_records(result['resistance_lines']),
+        'trade_stats': summarize_trades(result['trade_stats']),
+    }
+    if stats is not None:
+        record['stats'] = stats.to_dict()
+    return record
+
+def expand_inputs(inputs: List[str]) -> List[str]:
+    """Expand directories (all *.csv inside) and glob patterns to a sorted list of files"""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(glob.glob(os.path.join(item, '*.csv')))
+        elif os.path.isfile(item):
+            paths.add(item)
+        else:
+            paths.update(p for p in glob.glob(item) if os.path.isfile(p))
+    return sorted(paths)
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def run_batch(paths: List[str],
+              config: AnalysisConfig = AnalysisConfig(),
+              workers: Optional[int] = None,
+              output: Optional[str] = None,
+              collect_stats: bool = False) -> List[Dict]:
+    """
+    Analyze many CSV files in a process pool and optionally write all
+    results to one JSON file. workers=1 runs in the current process.
+    collect_stats adds every file's PipelineStats dict to its record.
+    """
+    if workers == 1:
+        results = [analyze_file(path, config, collect_stats) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(analyze_file, paths, repeat(config), repeat(collect_stats)))
+
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump({'config': asdict(config), 'results': results}, f, indent=2, default=_json_default)
+    return results
@@ -0,0 +1,86 @@
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Optional
+
+@dataclass
+class PipelineStats:
+    """
+    Timings and hot-path counters of one analysis run.
+
+    Pass an instance as `stats` to run_pipeline (or to the stage functions
+    themselves) to fill it in; with the default None the functions only do
+    an `is not None` check per call or chunk, so collecting is free when off.
+    Counters add up, so one instance can collect several runs.
+    """
+    # Wall time in seconds per computed stage, and per side as 'stage/support'
+    stage_times: Dict[str, float] = field(default_factory=dict)
+    # Stages taken from memory or the disk cache instead of being computed
+    cached_stages: List[str] = field(default_factory=list)
+    hough_calls: int = 0  # (main point, future pivot range) pairs voted
+    hough_batches: int = 0  # hough_transform_batch calls
+    accumulator_cells: int = 0  # rows x points x thetas evaluated
+    candidates_per_range: Dict[int, int] = field(default_factory=dict)
+    rejected_false_breakouts: int = 0  # Scored lines over max_false_breakouts
+    rejected_min_score: int = 0  # Scored lines under min_score
+    redundant_lines: int = 0  # Dropped by the redundancy filter
+    event_lines: int = 0  # Lines passed to event detection
+    # Bars from each line's start to the last bar, the span its events are
+    # looked for in. A measure of input size, not of work: detect_events_batch
+    # skips most of these bars, detect_events compares all of them
+    event_span_bars: int = 0
+
+    @contextmanager
+    def timer(self, name: str):
+        """Add the wall time of the with-block to stage_times[name]"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_times[name] = self.stage_times.get(name, 0.0) + time.perf_counter() - start
+
+    def count_candidates(self, future_range: int, count: int):
+        self.candidates_per_range[future_range] = self.candidates_per_range.get(future_range, 0) + count
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PipelineStats':
+        """Inverse of to_dict, also for dicts read back from JSON (string range keys)"""
+        data = dict(data)
+        data['candidates_per_range'] = {int(k): v for k, v in data.get('candidates_per_range', {}).items()}
+        return cls(**data)
+
+    def report(self) -> str:
+        """Multi-line text summary for the command line and the GUI"""
+        lines = ["Stage times:"]
+        # Sides finish (and are recorded) before their stage, but are listed under it
+        sides_of = {}
+        for name in self.stage_times:
+            stage, _, side = name.partition('/')
+            sides_of.setdefault(stage, [])
+            if side:
+                sides_of[stage].append(name)
+        for stage, sides in sides_of.items():
+            if stage in self.stage_times:
+                lines.append(f"  {stage:<22}{self.stage_times[stage] * 1000:>10.1f} ms")
+            for name in sides:
+                label = f"  {name.partition('/')[2]}" if stage in self.stage_times else name
+                lines.append(f"  {label:<22}{self.stage_times[name] * 1000:>10.1f} ms")
+        if self.cached_stages:
+            lines.append(f"Reused stages: {', '.join(self.cached_stages)}")
+        lines.append(f"Hough calls: {self.hough_calls} in {self.hough_batches} batches, "
+                     f"{self.accumulator_cells} accumulator cells")
+        if self.candidates_per_range:
+            per_range = ', '.join(f"{future_range}: {count}"
+                                  for future_range, count in sorted(self.candidates_per_range.items()))
+            lines.append(f"Candidates per future pivot range: {per_range}")
+        lines.append(f"Lines rejected: {self.rejected_false_breakouts} by max false breakouts, "
+                     f"{self.rejected_min_score} by min score, {self.redundant_lines} redundant")
+        lines.append(f"Event detection: {self.event_lines} lines, {self.event_span_bars} bars spanned")
+        return '\n'.join(lines)
+
+def stats_timer(stats: Optional[PipelineStats], name: str):
+    """stats.timer(name), or a no-op context when stats is None"""
+    return nullcontext() if stats is None else stats.timer(name)
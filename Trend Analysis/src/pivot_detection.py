@@ -1,6 +1,8 @@
 
 import pandas as pd
 import numpy as np
+from collections import deque
+from typing import List, Optional, Tuple
 from scipy.signal import argrelextrema
 
 def get_pivot_points(df: pd.DataFrame, window: int = 5) -> tuple:
@@ -10,6 +12,79 @@ def get_pivot_points(df: pd.DataFrame, window: int = 5) -> tuple:
     """
     high_idx = argrelextrema(df['close'].values, np.greater, order=window)[0]
     low_idx = argrelextrema(df['close'].values, np.less, order=window)[0]
-    
+
     return high_idx, low_idx
 
+class PivotStream:
+    """
+    Incremental pivot detector for bars that arrive one at a time.
+
+    Keeps a ring buffer of the last 2*window+1 closes. A bar is confirmed as a
+    high (low) pivot `window` bars after it formed, when its close is strictly
+    greater (less) than every other close within `window` bars on both sides,
+    which is the same rule get_pivot_points applies through argrelextrema.
+    The last `window` bars are not confirmed yet; unconfirmed() evaluates
+    them the way the batch function would on the data seen so far.
+    """
+    def __init__(self, window: int = 5):
+        self.window = window
+        self.closes = deque(maxlen=2 * window + 1)
+        self.n_bars = 0
+        self.high_pivots: List[int] = []
+        self.low_pivots: List[int] = []
+
+    def update(self, close: float) -> Optional[Tuple[int, str]]:
+        """
+        Add the next close. Returns (index, 'high' | 'low') if this bar
+        confirms a pivot `window` bars back, otherwise None.
+        """
+        self.closes.append(close)
+        self.n_bars += 1
+
+        candidate = self.n_bars - 1 - self.window
+        if candidate < 0:
+            return None
+
+        kind = self._classify(candidate, self.n_bars - 1)
+        if kind == 'high':
+            self.high_pivots.append(candidate)
+        elif kind == 'low':
+            self.low_pivots.append(candidate)
+        return (candidate, kind) if kind is not None else None
+
+    def unconfirmed(self) -> List[Tuple[int, str]]:
+        """Pivots among the last `window` bars, judged on the bars seen so far"""
+        pivots = []
+        for candidate in range(max(0, self.n_bars - self.window), self.n_bars):
+            kind = self._classify(candidate, self.n_bars - 1)
+            if kind is not None:
+                pivots.append((candidate, kind))
+        return pivots
+
+    def pivot_points(self, include_unconfirmed: bool = False) -> tuple:
+        """(high_idx, low_idx) arrays, like get_pivot_points"""
+        high_idx = list(self.high_pivots)
+        low_idx = list(self.low_pivots)
+        if include_unconfirmed:
+            for idx, kind in self.unconfirmed():
+                (high_idx if kind == 'high' else low_idx).append(idx)
+        return np.array(high_idx, dtype=int), np.array(low_idx, dtype=int)
+
+    def _classify(self, candidate: int, last: int) -> Optional[str]:
+        # argrelextrema clips the window at the series ends, so the first and
+        # last bars are compared with themselves and can never be pivots
+        if candidate == 0 or candidate == last:
+            return None
+
+        first_in_buffer = self.n_bars - len(self.closes)
+        lo = max(candidate - self.window, 0) - first_in_buffer
+        hi = min(candidate + self.window, last) - first_in_buffer
+        pos = candidate - first_in_buffer
+
+        value = self.closes[pos]
+        others = [self.closes[k] for k in range(lo, hi + 1) if k != pos]
+        if all(value > other for other in others):
+            return 'high'
+        if all(value < other for other in others):
+            return 'low'
+        return None
@@ -0,0 +1,59 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+import pandas as pd
+import numpy as np
+from .utils import calculate_atr
+
+@dataclass
+class PriceContext:
+    """
+    Contiguous NumPy view of the price data used by trendline detection,
+    built once per run so the hot loops never index the DataFrame.
+    """
+    close: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    atr: np.ndarray
+    is_high_pivot: np.ndarray
+    is_low_pivot: np.ndarray
+    margins: Dict[float, np.ndarray] = field(default_factory=dict)
+    high_pivots: np.ndarray = field(init=False)
+    low_pivots: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        # Sorted pivot indices, for jumping from one pivot to the next
+        self.high_pivots = np.flatnonzero(self.is_high_pivot)
+        self.low_pivots = np.flatnonzero(self.is_low_pivot)
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame,
+                high_pivots: Optional[Iterable[int]] = None,
+                low_pivots: Optional[Iterable[int]] = None) -> 'PriceContext':
+        """Build the context from a DataFrame with 'high', 'low', 'close' (and optionally 'atr')"""
+        atr = df['atr'] if 'atr' in df.columns else calculate_atr(df)
+        n = len(df)
+        return cls(
+            close=np.ascontiguousarray(df['close'].to_numpy(dtype=float)),
+            high=np.ascontiguousarray(df['high'].to_numpy(dtype=float)),
+            low=np.ascontiguousarray(df['low'].to_numpy(dtype=float)),
+            atr=np.ascontiguousarray(atr.to_numpy(dtype=float)),
+            is_high_pivot=pivot_mask(high_pivots, n),
+            is_low_pivot=pivot_mask(low_pivots, n),
+        )
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def margin(self, atr_multiplier: float = 0.5) -> np.ndarray:
+        """Dynamic ATR margin for every bar, computed once per multiplier"""
+        if atr_multiplier not in self.margins:
+            self.margins[atr_multiplier] = self.atr * atr_multiplier
+        return self.margins[atr_multiplier]
+
+def pivot_mask(pivots: Optional[Iterable[int]], length: int) -> np.ndarray:
+    """Boolean mask of length `length` that is True at the given pivot indices"""
+    mask = np.zeros(length, dtype=bool)
+    if pivots is not None:
+        indices = np.fromiter(pivots, dtype=int)
+        mask[indices] = True
+    return mask
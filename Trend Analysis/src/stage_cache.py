@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'trend_analysis', 'stages')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Bump when a stage's output changes for the same data and parameters
+STAGE_CACHE_VERSION = 2
+
+_MISSING = object()
+
+def frame_hash(df: pd.DataFrame, columns=('open', 'high', 'low', 'close')) -> str:
+    """SHA-256 of the price columns of a DataFrame, for data not loaded from a file"""
+    digest = hashlib.sha256()
+    digest.update(str(len(df)).encode())
+    for name in columns:
+        if name in df.columns:
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(df[name].to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+class StageCache:
+    """
+    Content-addressed on-disk cache of pipeline stage outputs.
+
+    An entry is keyed by the hash of the input data, the stage name and the
+    parameters the stage depends on, so a changed CSV never hits old entries.
+    Entries are pickle files whose mtime is their last use; when the total
+    size exceeds max_bytes the least recently used ones are deleted.
+    """
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data_key: str, stage: str, params: Dict) -> str:
+        """Hash of cache version, data, stage name and parameters"""
+        text = json.dumps({'version': STAGE_CACHE_VERSION, 'data': data_key, 'stage': stage, 'params': params},
+                          sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Cached value of key, or default; a hit marks the entry as recently used"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Unreadable or written by an incompatible version
+            self._remove(path)
+            return default
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any):
+        """Store value under key and evict old entries beyond the size cap"""
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            self._remove(tmp)
+            raise
+        self.evict()
+
+    def get_or_compute(self, data_key: str, stage: str, params: Dict, compute: Callable[[], Any]) -> Any:
+        """Cached output of a stage, computing and storing it on a miss"""
+        key = self.key(data_key, stage, params)
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        try:
+            self.put(key, value)
+        except OSError:
+            pass
+        return value
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def size(self) -> int:
+        """Total bytes of all entries"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """Delete all entries"""
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from itertools import product
+from typing import List, Tuple, Dict, Optional
+from .pivot_detection import get_pivot_points
+from .trendline_detection import (simple_trendlines, hough_candidates, merge_hough_candidates,
+                                  score_hough_candidates, filter_hough_lines)
+from .price_context import PriceContext
+from .backtest import simulate_trades
+from .pipeline import AnalysisConfig, summarize_trades
+from .utils import prepare_data_with_atr
+
+@dataclass(frozen=True)
+class SweepGrid:
+    """Parameter values to try; every combination is one analysis run"""
+    windows: Tuple[int, ...] = (5,)
+    atr_periods: Tuple[int, ...] = (14,)
+    atr_multipliers: Tuple[float, ...] = (0.4,)
+    min_scores: Tuple[float, ...] = (15.0,)
+    range1s: Tuple[int, ...] = (10,)
+    range2s: Tuple[int, ...] = (0,)
+
+    def size(self, method: int = 2) -> int:
+        """Number of distinct combinations; method 1 ignores min score and ranges"""
+        n = len(self.windows) * len(self.atr_periods) * len(self.atr_multipliers)
+        if method == 2:
+            n *= len(self.min_scores) * len(self.range1s) * len(self.range2s)
+        return n
+
+SWEEP_COLUMNS = ['window', 'atr_period', 'atr_multiplier', 'min_score', 'range1', 'range2',
+                 'support_lines', 'resistance_lines', 'total_trades', 'win_count',
+                 'loss_count', 'win_rate', 'total_pnl']
+
+# Data shared with the worker processes, set once per process by _init_worker
+_shared: Dict = {}
+
+def _init_worker(frames: Dict[int, pd.DataFrame], pivots: Dict[int, Tuple[np.ndarray, np.ndarray]]):
+    _shared['frames'] = frames
+    _shared['pivots'] = pivots
+
+def _candidates_task(window: int, future_range: int) -> Tuple[List, List]:
+    """Hough candidates of one window and a single future pivot range, for both sides"""
+    high_pivots, low_pivots = _shared['pivots'][window]
+    close = next(iter(_shared['frames'].values()))['close'].to_numpy(dtype=float)
+    support = hough_candidates(low_pivots, close, high_pivots, low_pivots, [future_range])
+    resistance = hough_candidates(high_pivots, close, high_pivots, low_pivots, [future_range])
+    return support, resistance
+
+def _result_row(combo: Dict, support_lines: List, resistance_lines: List,
+                df: pd.DataFrame, config: AnalysisConfig) -> Dict:
+    stats = summarize_trades(simulate_trades(
+        df, support_lines, resistance_lines,
+        reward_ratio=config.reward_ratio,
+        event_window=config.event_window,
+        atr_multiplier=config.trade_atr_multiplier,
+        risk_per_trade=config.risk_per_trade
+    ))
+    row = dict(combo)
+    row.update({
+        'support_lines': len(support_lines),
+        'resistance_lines': len(resistance_lines),
+        'total_trades': stats['total_trades'],
+        'win_count': stats['win_count'],
+        'loss_count': stats['loss_count'],
+        'win_rate': stats['win_rate'],
+        'total_pnl': stats['total_pnl'],
+    })
+    return row
+
+def _hough_task(window: int, atr_period: int, atr_multiplier: float, ranges: Tuple[int, int],
+                candidates: Tuple[List, List], min_scores: Tuple[float, ...],
+                config: AnalysisConfig) -> List[Dict]:
+    """
+    Score the candidates of one (window, ATR, ranges) setting once, then only
+    filter and backtest for every min score
+    """
+    df = _shared['frames'][atr_period]
+    high_pivots, low_pivots = _shared['pivots'][window]
+    ctx = PriceContext.from_df(df, high_pivots, low_pivots)
+
+    scored_support = score_hough_candidates(candidates[0], low_pivots, df, True, atr_multiplier, ctx=ctx)
+    scored_resistance = score_hough_candidates(candidates[1], high_pivots, df, False, atr_multiplier, ctx=ctx)
+
+    rows = []
+    for min_score in min_scores:
+        support_lines = filter_hough_lines(scored_support, min_score)
+        resistance_lines = filter_hough_lines(scored_resistance, min_score)
+        combo = {'window': window, 'atr_period': atr_period, 'atr_multiplier': atr_multiplier,
+                 'min_score': min_score, 'range1': ranges[0], 'range2': ranges[1]}
+        rows.append(_result_row(combo, support_lines, resistance_lines, df, config))
+    return rows
+
+def _simple_task(window: int, atr_period: int, atr_multiplier: float,
+                 config: AnalysisConfig) -> List[Dict]:
+    """Linear regression lines of one (window, ATR) setting"""
+    df = _shared['frames'][atr_period]
+    high_pivots, low_pivots = _shared['pivots'][window]
+    ctx = PriceContext.from_df(df, high_pivots, low_pivots)
+
+    support_lines = simple_trendlines(low_pivots, df, True, high_pivots, low_pivots,
+                                      atr_multiplier=atr_multiplier, ctx=ctx)
+    resistance_lines = simple_trendlines(high_pivots, df, False, high_pivots, low_pivots,
+                                         atr_multiplier=atr_multiplier, ctx=ctx)
+    combo = {'window': window, 'atr_period': atr_period, 'atr_multiplier': atr_multiplier,
+             'min_score': np.nan, 'range1': np.nan, 'range2': np.nan}
+    return [_result_row(combo, support_lines, resistance_lines, df, config)]
+
+def _run_tasks(executor: Optional[ProcessPoolExecutor], func, tasks: List[Tuple]) -> List:
+    if executor is None:
+        return [func(*task) for task in tasks]
+    return list(executor.map(func, *zip(*tasks))) if tasks else []
+
+def run_sweep(df: pd.DataFrame,
+              grid: SweepGrid = SweepGrid(),
+              config: AnalysisConfig = AnalysisConfig(),
+              workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Run the analysis for every combination of the grid on one DataFrame.
+
+    Pivots are computed once per window, ATR once per period and Hough
+    candidates once per (window, range); only scoring, filtering and the
+    backtest run per combination. Trade settings and the method come from
+    config. Returns one row per combination ranked by win rate, then P/L.
+    workers=1 runs in the current process.
+    """
+    frames = {period: prepare_data_with_atr(df, period) for period in dict.fromkeys(grid.atr_periods)}
+    any_frame = next(iter(frames.values()))
+    pivots = {window: get_pivot_points(any_frame, window=window) for window in dict.fromkeys(grid.windows)}
+
+    executor = None
+    if workers != 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(frames, pivots))
+    else:
+        _init_worker(frames, pivots)
+
+    try:
+        windows = list(pivots)
+        periods = list(frames)
+        multipliers = list(dict.fromkeys(grid.atr_multipliers))
+
+        if config.method == 1:
+            tasks = [(window, period, multiplier, config)
+                     for window, period, multiplier in product(windows, periods, multipliers)]
+            results = _run_tasks(executor, _simple_task, tasks)
+        else:
+            single_ranges = list(dict.fromkeys(grid.range1s + grid.range2s))
+            keys = list(product(windows, single_ranges))
+            per_range = dict(zip(keys, _run_tasks(executor, _candidates_task, keys)))
+
+            min_scores = tuple(dict.fromkeys(grid.min_scores))
+            tasks = []
+            for window, r1, r2 in product(windows, dict.fromkeys(grid.range1s), dict.fromkeys(grid.range2s)):
+                first, second = per_range[(window, r1)], per_range[(window, r2)]
+                candidates = (merge_hough_candidates([first[0], second[0]]),
+                              merge_hough_candidates([first[1], second[1]]))
+                for period, multiplier in product(periods, multipliers):
+                    tasks.append((window, period, multiplier, (r1, r2), candidates, min_scores, config))
+            results = _run_tasks(executor, _hough_task, tasks)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    rows = [row for task_rows in results for row in task_rows]
+    table = pd.DataFrame(rows, columns=SWEEP_COLUMNS)
+    return table.sort_values(['win_rate', 'total_pnl'], ascending=False, kind='stable').reset_index(drop=True)
+
+def sweep_config(row: pd.Series, config: AnalysisConfig = AnalysisConfig()) -> AnalysisConfig:
+    """AnalysisConfig reproducing one row of a sweep table"""
+    config = replace(config, window=int(row['window']), atr_period=int(row['atr_period']),
+                     atr_multiplier=float(row['atr_multiplier']))
+    if config.method == 2:
+        config = replace(config, min_score=float(row['min_score']),
+                         future_pivot_ranges=(int(row['range1']), int(row['range2'])))
+    return config
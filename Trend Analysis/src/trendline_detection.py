@@ -1,121 +1,155 @@
 import numpy as np
-from typing import List, Tuple, Set, Optional
+from typing import Callable, List, Tuple, Set, Optional
 import pandas as pd
-from scipy import stats
 from enum import Enum
 from dataclasses import dataclass
-from .hough_transform import hough_transform_from_point
-from .trendline_events import detect_events, TrendlineEvents, calculate_trendline_score, get_dynamic_margin
+from .hough_transform import hough_transform_from_point, hough_transform_batch
+from .trendline_events import detect_events_batch, find_first_breakouts, TrendlineEvents, calculate_trendline_score
 from .utils import calculate_atr
+from .price_context import PriceContext
+from .pipeline_stats import PipelineStats
 
 def simple_trendlines(pivot_points: List[int], df: pd.DataFrame, is_support: bool = True,
                      high_pivots: List[int] = None, low_pivots: List[int] = None,
-                     atr_multiplier: float = 0.5) -> List[Tuple[float, float, int, TrendlineEvents]]:
-    """simple trendline finder with dynamic margin and event detection"""
-    valid_lines = []
+                     atr_multiplier: float = 0.5,
+                     ctx: Optional[PriceContext] = None,
+                     stats: Optional[PipelineStats] = None) -> List[Tuple[float, float, int, TrendlineEvents]]:
+    """
+    simple trendline finder with dynamic margin and event detection
     
+    All consecutive pivot pairs are checked at once; the first breakout after
+    each valid line's second pivot is kept in events.breakout_point.
+    stats: optional PipelineStats for the event detection counters.
+    """
     # Ensure ATR is calculated
     if not hasattr(df, 'atr'):
         df['atr'] = calculate_atr(df)
     
-    # Convert to sets for event detection
-    high_pivots_set = set(high_pivots if high_pivots is not None else [])
-    low_pivots_set = set(low_pivots if low_pivots is not None else [])
+    # Build the array context once for event detection
+    if ctx is None:
+        ctx = PriceContext.from_df(df, high_pivots, low_pivots)
+    close = ctx.close
+    margins = ctx.margin()
     
-    for i in range(len(pivot_points) - 1):
-        x1, x2 = pivot_points[i], pivot_points[i + 1]
-        y1, y2 = df['close'].iloc[x1], df['close'].iloc[x2]
-        
-        # Calculate slope and intercept for the trendline
-        slope = (y2 - y1) / (x2 - x1)
-        intercept = y1 - slope * x1
-        
-        valid = True
-        breakout_point = len(df)
-        
-        # Check future breakout points beyond the last pivot
-        for k in range(x2, len(df)):
-            y_line = slope * k + intercept
-            margin = get_dynamic_margin(df, k)
-            if is_support and df['close'].iloc[k] < y_line - margin:
-                breakout_point = k
-                break
-            elif not is_support and df['close'].iloc[k] > y_line + margin:
-                breakout_point = k
-                break
-        
-        # Verify line validity between x1 and x2
-        y_line = slope * np.array(range(x1, x2 + 1)) + intercept
-        for k in range(x1, x2 + 1):
-            margin = get_dynamic_margin(df, k)
-            if is_support and df['close'].iloc[k] < y_line[k - x1] - margin:
-                valid = False
-                break
-            elif not is_support and df['close'].iloc[k] > y_line[k - x1] + margin:
-                valid = False
-                break
-        
-        if valid:
-            # Create a line tuple in the format expected by detect_events
-            line = (slope, intercept, x1)
-            
-            # Detect events for this line
-            events = detect_events(line, df, high_pivots_set, low_pivots_set, is_support, atr_multiplier)
-            
-            # Add to valid lines
-            valid_lines.append((slope, intercept, x1, events))
+    pivots = np.asarray(pivot_points, dtype=int)
+    if len(pivots) < 2:
+        return []
+    
+    # Calculate slope and intercept for the trendline of every consecutive pair
+    x1, x2 = pivots[:-1], pivots[1:]
+    y1, y2 = close[x1], close[x2]
+    slopes = (y2 - y1) / (x2 - x1)
+    intercepts = y1 - slopes * x1
+    
+    # Verify line validity between x1 and x2, over all spans concatenated
+    lengths = np.maximum(x2 - x1 + 1, 0)
+    pair_ids = np.repeat(np.arange(len(x1)), lengths)
+    span_offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    bars = np.arange(lengths.sum()) - span_offsets + np.repeat(x1, lengths)
+    y_line = slopes[pair_ids] * bars + intercepts[pair_ids]
+    if is_support:
+        violations = close[bars] < y_line - margins[bars]
+    else:
+        violations = close[bars] > y_line + margins[bars]
+    valid = np.bincount(pair_ids[violations], minlength=len(x1)) == 0
+    
+    valid_pairs = np.flatnonzero(valid)
+    
+    # Check future breakout points beyond the last pivot
+    breakout_points = find_first_breakouts(slopes[valid_pairs], intercepts[valid_pairs],
+                                           x2[valid_pairs], ctx, is_support)
+    
+    # Detect events for all valid lines together
+    lines = [(slopes[i], intercepts[i], int(x1[i])) for i in valid_pairs]
+    all_events = detect_events_batch(lines, ctx, is_support, atr_multiplier, stats=stats)
+    
+    valid_lines = []
+    for line, events, breakout_point in zip(lines, all_events, breakout_points.tolist()):
+        events.breakout_point = breakout_point
+        valid_lines.append((line[0], line[1], line[2], events))
     
     return valid_lines
 
 def get_points_on_line(line: Tuple[float, float, int], 
                       pivot_points: List[int],
                       df: pd.DataFrame,
-                      atr_multiplier: float = 0.5) -> List[int]:
+                      atr_multiplier: float = 0.5,
+                      ctx: Optional[PriceContext] = None) -> List[int]:
     """
     Get consecutive valid touches of the line with dynamic margin
     """
     slope, intercept, start_point = line
-    points_on_line = []
+    if ctx is None:
+        ctx = PriceContext.from_df(df)
     
-    sorted_pivots = sorted([p for p in pivot_points if p >= start_point])
+    sorted_pivots = np.sort(np.asarray(pivot_points, dtype=int))
+    sorted_pivots = sorted_pivots[sorted_pivots >= start_point]
     
-    for pivot in sorted_pivots:
-        y_line = slope * pivot + intercept
-        margin = get_dynamic_margin(df, pivot, atr_multiplier)
-        if abs(df['close'].iloc[pivot] - y_line) <= margin:
-            points_on_line.append(pivot)
+    y_line = slope * sorted_pivots + intercept
+    margin = ctx.margin(atr_multiplier)[sorted_pivots]
+    on_line = np.abs(ctx.close[sorted_pivots] - y_line) <= margin
     
-    return points_on_line
+    return sorted_pivots[on_line].tolist()
 
 def is_line_valid_between_pivots(line: Tuple[float, float, int],
                                 first_pivot: int,
                                 second_pivot: int,
                                 df: pd.DataFrame,
                                 is_support: bool,
-                                atr_multiplier: float = 0.5) -> bool:
+                                atr_multiplier: float = 0.5,
+                                ctx: Optional[PriceContext] = None) -> bool:
     """
     Check if a line is valid between two pivot points by verifying that all price
     points respect the line's support/resistance nature within the ATR margin.
     """
     slope, intercept, _ = line
+    if ctx is None:
+        ctx = PriceContext.from_df(df)
     
     # Check every point between the pivots
-    for idx in range(first_pivot, second_pivot + 1):
-        price = df['close'].iloc[idx]
-        line_value = slope * idx + intercept
-        margin = get_dynamic_margin(df, idx, atr_multiplier)
-        distance = price - line_value  # Signed distance
+    span = np.arange(first_pivot, second_pivot + 1)
+    margin = ctx.margin(atr_multiplier)[span]
+    distance = ctx.close[span] - (slope * span + intercept)  # Signed distance
+    
+    if is_support:
+        # For support line, no price should be below the line by more than ATR margin
+        return not np.any(distance < -margin)
+    # For resistance line, no price should be above the line by more than ATR margin
+    return not np.any(distance > margin)
+
+def line_from_theta(main_point: Tuple[int, float],
+                    theta: float,
+                    pivot_points: List[int],
+                    df: pd.DataFrame,
+                    is_support: bool,
+                    atr_multiplier: float = 0.5,
+                    ctx: Optional[PriceContext] = None) -> Optional[Tuple]:
+    """
+    Build the line through main point at the Hough angle theta and validate it
+    """
+    if abs(np.sin(theta)) > 1e-10:
+        slope = -np.cos(theta) / np.sin(theta)
+        intercept = main_point[1] - slope * main_point[0]
+        start_point = int(main_point[0])
+        line = (slope, intercept, start_point)
+        
+        supporting_points = get_points_on_line(line, pivot_points, df, atr_multiplier, ctx=ctx)
         
-        if is_support:
-            # For support line, no price should be below the line by more than ATR margin
-            if distance < -margin:
-                return False
-        else:
-            # For resistance line, no price should be above the line by more than ATR margin
-            if distance > margin:
-                return False
-    
-    return True
+        if len(supporting_points) >= 2:
+            first_two_valid = is_line_valid_between_pivots(
+                line, 
+                supporting_points[0],
+                supporting_points[1],
+                df,
+                is_support,
+                atr_multiplier,
+                ctx=ctx
+            )
+            
+            if first_two_valid:
+                return line, supporting_points
+    
+    return None
 
 def find_valid_line(main_point: Tuple[int, float], 
                     points_array: np.ndarray,
@@ -124,124 +158,234 @@ def find_valid_line(main_point: Tuple[int, float],
                     low_pivots: Set[int],
                     df: pd.DataFrame,
                     is_support: bool,
-                    atr_multiplier: float = 0.5) -> Optional[Tuple]:
+                    atr_multiplier: float = 0.5,
+                    ctx: Optional[PriceContext] = None) -> Optional[Tuple]:
     """
     Find a valid line from main point with dynamic margin
     """
     theta, rho, votes = hough_transform_from_point(main_point, points_array)
     
     if theta is not None:
-        if abs(np.sin(theta)) > 1e-10:
-            slope = -np.cos(theta) / np.sin(theta)
-            intercept = main_point[1] - slope * main_point[0]
-            start_point = int(main_point[0])
-            line = (slope, intercept, start_point)
-            
-            supporting_points = get_points_on_line(line, pivot_points, df, atr_multiplier)
-            
-            if len(supporting_points) >= 2:
-                first_two_valid = is_line_valid_between_pivots(
-                    line, 
-                    supporting_points[0],
-                    supporting_points[1],
-                    df,
-                    is_support,
-                    atr_multiplier
-                )
-                
-                if first_two_valid:
-                    return line, supporting_points
+        return line_from_theta(main_point, theta, pivot_points, df, is_support, atr_multiplier, ctx=ctx)
     
     return None
 
-def hough_transform_trendlines(pivot_points: List[int], 
-                             df: pd.DataFrame, 
-                             is_support: bool = True,
-                             high_pivots: List[int] = None, 
-                             low_pivots: List[int] = None,
-                             future_pivot_ranges: List[int] = [8, 20],
-                             min_score: float = 5.0,
-                             max_false_breakouts: int = 2,
-                             atr_multiplier: float = 0.5) -> List[Tuple[float, float, int, TrendlineEvents]]:
+def hough_candidates(pivot_points: List[int],
+                     close: np.ndarray,
+                     high_pivots: List[int] = None,
+                     low_pivots: List[int] = None,
+                     future_pivot_ranges: List[int] = [8, 20],
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     chunk_size: int = 256,
+                     stats: Optional[PipelineStats] = None) -> List[Tuple[int, int, float, float, int]]:
     """
-    Find valid lines for different ranges of future pivots with dynamic ATR-based margin
+    Hough angles of every (main point, future pivot range) pair that found a line.
+    
+    Only depends on the pivots and closes, not on ATR, so it can be reused
+    across ATR settings. Returns (main_position, main_idx, main_close, theta,
+    range_used) tuples, ordered main point first, then range.
+    
+    progress: called with (main points done, total) after every chunk of
+    chunk_size main points; it may raise to abort the work.
+    stats: optional PipelineStats counting the Hough work and the
+    candidates found per range.
     """
-    if not hasattr(df, 'atr'):
-        df['atr'] = calculate_atr(df)
-        
-    high_pivots = set(high_pivots if high_pivots is not None else [])
-    low_pivots = set(low_pivots if low_pivots is not None else [])
+    # Sorted pivot sequence with its closes; the future pivots of a main point
+    # are the contiguous slice after its position, found by binary search
+    pivot_array = np.union1d(np.asarray(high_pivots if high_pivots is not None else [], dtype=int),
+                             np.asarray(low_pivots if low_pivots is not None else [], dtype=int))
+    pivot_closes = close[pivot_array]
+    main_indices = np.asarray(pivot_points, dtype=int)
+    main_closes = close[main_indices]
+    main_seqs = np.searchsorted(pivot_array, main_indices)
+    is_pivot = main_seqs < len(pivot_array)
+    is_pivot[is_pivot] = pivot_array[main_seqs[is_pivot]] == main_indices[is_pivot]
+    if not is_pivot.all():
+        raise ValueError(f"Main points {main_indices[~is_pivot].tolist()} are not high or low pivots")
     
-    all_pivot_indices = sorted(list(high_pivots | low_pivots))
-    pivot_sequence = {idx: seq for seq, idx in enumerate(all_pivot_indices)}
+    max_range = max(future_pivot_ranges, default=0)
+    offsets = np.arange(1, max_range + 1)
+    ranges = np.asarray(future_pivot_ranges, dtype=int)
     
-    points = [(idx, df['close'].iloc[idx]) for idx in pivot_points]
-    valid_lines = []
+    # One window of the longest range per main point, shared by all ranges:
+    # a range's window is a view of its first columns
+    window_seqs = main_seqs[:, None] + offsets
+    in_window = window_seqs < len(pivot_array)
+    window_seqs = np.minimum(window_seqs, max(len(pivot_array) - 1, 0))
+    window_points = np.zeros(window_seqs.shape + (2,))
+    if len(pivot_array):
+        window_points[..., 0] = pivot_array[window_seqs]
+        window_points[..., 1] = pivot_closes[window_seqs]
+    main_array = np.column_stack([main_indices, main_closes])
+    
+    # Votes are computed per chunk of main points and range in large batches.
+    # Pairs are ordered main point first, then range, like the original loops
+    pair_ranges = np.tile(ranges, len(main_seqs))
+    thetas = np.full((len(main_seqs), len(ranges)), np.nan)
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(main_seqs), chunk_size):
+        rows = slice(start, start + chunk_size)
+        for k, future_range in enumerate(ranges.tolist()):
+            columns = slice(0, max(future_range, 0))
+            thetas[rows, k], _, _ = hough_transform_batch(main_array[rows], window_points[rows, columns],
+                                                          in_window[rows, columns], stats=stats)
+        if progress is not None:
+            progress(min(start + chunk_size, len(main_seqs)), len(main_indices))
+    thetas = thetas.ravel()
     
-    # Process each main point for each future pivot range
-    for i, main_point in enumerate(points):
-        main_idx = main_point[0]
-        main_seq = pivot_sequence[main_idx]
+    if stats is not None:
+        found = ~np.isnan(thetas)
+        for future_range in ranges.tolist():
+            stats.count_candidates(future_range, int(np.count_nonzero(found & (pair_ranges == future_range))))
+    
+    candidates = []
+    for pair in np.flatnonzero(~np.isnan(thetas)):
+        main_pos = pair // len(ranges)
+        candidates.append((int(main_pos), main_indices[main_pos], main_closes[main_pos],
+                           thetas[pair], int(pair_ranges[pair])))
+    return candidates
+
+def merge_hough_candidates(per_range: List[List[Tuple]]) -> List[Tuple]:
+    """
+    Combine candidates computed separately for each future pivot range into
+    the order hough_candidates gives for all ranges together
+    """
+    merged = [candidate for candidates in per_range for candidate in candidates]
+    merged.sort(key=lambda candidate: candidate[0])
+    return merged
+
+def score_hough_candidates(candidates: List[Tuple],
+                           pivot_points: List[int],
+                           df: pd.DataFrame,
+                           is_support: bool,
+                           atr_multiplier: float = 0.5,
+                           ctx: Optional[PriceContext] = None,
+                           progress: Optional[Callable[[int, int], None]] = None,
+                           stats: Optional[PipelineStats] = None,
+                           high_pivots: List[int] = None,
+                           low_pivots: List[int] = None) -> List[Tuple]:
+    """
+    Validate Hough candidates and detect their events.
+    Returns (line, supporting_points, events, score, range_used) for every valid line.
+    
+    Without ctx one is built from df and high_pivots/low_pivots, which the
+    touches and throwbacks are found on.
+    progress: called with (candidates done, total) every 100 candidates and
+    after event detection; it may raise to abort the work.
+    stats: optional PipelineStats for the event detection counters.
+    """
+    if ctx is None:
+        ctx = PriceContext.from_df(df, high_pivots, low_pivots)
+    
+    valid_lines = []
+    for done, (_, main_idx, main_close, theta, range_used) in enumerate(candidates):
+        if progress is not None and done % 100 == 0:
+            progress(done, len(candidates))
+        result = line_from_theta(
+            (main_idx, main_close),
+            theta,
+            pivot_points,
+            df,
+            is_support,
+            atr_multiplier,
+            ctx=ctx
+        )
         
-        for max_future_pivots in future_pivot_ranges:
-            max_seq = main_seq + max_future_pivots
-            future_indices = [idx for idx in all_pivot_indices 
-                            if main_idx < idx and pivot_sequence[idx] <= max_seq]
-            
-            future_points = [(idx, df['close'].iloc[idx]) for idx in future_indices]
-            if not future_points:
-                continue
-                
-            points_array = np.array([(main_point[0], main_point[1])] + future_points)
-            
-            result = find_valid_line(
-                main_point,
-                points_array,
-                pivot_points,
-                high_pivots,
-                low_pivots,
-                df,
-                is_support,
-                atr_multiplier
-            )
-            
-            if result is not None:
-                line, supporting_points = result
-                valid_lines.append((line, supporting_points, max_future_pivots))
+        if result is not None:
+            line, supporting_points = result
+            valid_lines.append((line, supporting_points, range_used))
     
     # Second phase: calculate events and scores
-    scored_lines = []
-    for line, supporting_points, range_used in valid_lines:
-        events = detect_events(line, df, high_pivots, low_pivots, is_support, atr_multiplier)
-        
+    all_events = detect_events_batch([line for line, _, _ in valid_lines], ctx, is_support, atr_multiplier,
+                                     stats=stats)
+    if progress is not None:
+        progress(len(candidates), len(candidates))
+    return [(line, supporting_points, events, calculate_trendline_score(events), range_used)
+            for (line, supporting_points, range_used), events in zip(valid_lines, all_events)]
+
+def filter_hough_lines(scored_lines: List[Tuple],
+                       min_score: float = 5.0,
+                       max_false_breakouts: int = 2,
+                       stats: Optional[PipelineStats] = None) -> List[Tuple[float, float, int, TrendlineEvents]]:
+    """
+    Keep scored lines with few enough false breakouts and a high enough
+    score, then drop lines sharing two or more supporting points with an
+    earlier accepted line
+    
+    stats: optional PipelineStats counting the lines rejected at each step
+    """
+    kept_lines = []
+    too_many_false = 0
+    for line, supporting_points, events, score, range_used in scored_lines:
         # Skip lines with too many false breakouts
         if len(events.false_breakouts) > max_false_breakouts:
+            too_many_false += 1
             continue
-            
-        score = calculate_trendline_score(events)
         if score >= min_score:
-            scored_lines.append((line, supporting_points, events, score, range_used))
+            kept_lines.append((line, supporting_points, events, score, range_used))
     
     # Sort by start time and range
-    scored_lines.sort(key=lambda x: x[0][2])
+    kept_lines.sort(key=lambda x: x[0][2])
     
-    # Filter out redundant lines
+    # Filter out redundant lines: a line sharing two or more points with an
+    # accepted line is dropped. Accepted lines are indexed by pivot, so each
+    # line only counts overlaps through its own points.
     final_lines = []
-    lines_with_points = []  # Store tuples of (line, points_set)
+    lines_by_pivot = {}  # pivot -> positions in final_lines of accepted lines through it
     
-    for line, points_on_line, events, score, _ in scored_lines:
+    for line, points_on_line, events, score, _ in kept_lines:
         points_set = set(points_on_line)
         is_redundant = False
+        overlap_counts = {}
         
-        # Check overlap with each existing line individually
-        for existing_line, existing_points in lines_with_points:
-            overlap_count = len(points_set & existing_points)
-            if overlap_count >= 2:
-                is_redundant = True
+        for point in points_set:
+            for accepted in lines_by_pivot.get(point, ()):
+                overlap_counts[accepted] = overlap_counts.get(accepted, 0) + 1
+                if overlap_counts[accepted] >= 2:
+                    is_redundant = True
+                    break
+            if is_redundant:
                 break
         
         if not is_redundant:
+            for point in points_set:
+                lines_by_pivot.setdefault(point, []).append(len(final_lines))
             final_lines.append((line[0], line[1], line[2], events))
-            lines_with_points.append((line, points_set))
     
-    return final_lines
\ No newline at end of file
+    if stats is not None:
+        stats.rejected_false_breakouts += too_many_false
+        stats.rejected_min_score += len(scored_lines) - too_many_false - len(kept_lines)
+        stats.redundant_lines += len(kept_lines) - len(final_lines)
+    return final_lines
+
+def hough_transform_trendlines(pivot_points: List[int], 
+                             df: pd.DataFrame, 
+                             is_support: bool = True,
+                             high_pivots: List[int] = None, 
+                             low_pivots: List[int] = None,
+                             future_pivot_ranges: List[int] = [8, 20],
+                             min_score: float = 5.0,
+                             max_false_breakouts: int = 2,
+                             atr_multiplier: float = 0.5,
+                             ctx: Optional[PriceContext] = None,
+                             candidates: Optional[List[Tuple]] = None,
+                             stats: Optional[PipelineStats] = None) -> List[Tuple[float, float, int, TrendlineEvents]]:
+    """
+    Find valid lines for different ranges of future pivots with dynamic ATR-based margin
+    
+    candidates: precomputed hough_candidates output for these pivots and ranges
+    stats: optional PipelineStats filled in by every step
+    """
+    if not hasattr(df, 'atr'):
+        df['atr'] = calculate_atr(df)
+        
+    if ctx is None:
+        ctx = PriceContext.from_df(df, high_pivots, low_pivots)
+    
+    if candidates is None:
+        candidates = hough_candidates(pivot_points, ctx.close, high_pivots, low_pivots, future_pivot_ranges,
+                                      stats=stats)
+    
+    scored_lines = score_hough_candidates(candidates, pivot_points, df, is_support, atr_multiplier, ctx=ctx,
+                                          stats=stats)
+    return filter_hough_lines(scored_lines, min_score, max_false_breakouts, stats=stats)
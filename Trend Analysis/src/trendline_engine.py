@@ -0,0 +1,493 @@
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+from .hough_transform import hough_transform_batch
+from .pivot_detection import PivotStream
+from .trendline_events import TrendlineEvents, calculate_trendline_score
+from .utils import ATRState
+
+class _SideLines:
+    """Lines of one side (support or resistance) with their event state machines"""
+    def __init__(self, is_support: bool):
+        self.is_support = is_support
+        self.slope = np.empty(0)
+        self.intercept = np.empty(0)
+        self.start = np.empty(0, dtype=int)
+        self.touched = np.empty(0, dtype=bool)
+        self.in_breakout = np.empty(0, dtype=bool)
+        self.waiting_for_pivot = np.empty(0, dtype=bool)
+        self.potential_breakout = np.empty(0, dtype=int)
+        # First close beyond the 0.5 ATR margin after the second pivot (simple method)
+        self.second_pivot = np.empty(0, dtype=int)
+        self.breakout_point = np.empty(0, dtype=int)
+        self.live = np.empty(0, dtype=bool)
+        self.ids = np.empty(0, dtype=int)
+        self.next_id = 0
+        self.events: List[TrendlineEvents] = []
+        self.supporting_points: List[List[int]] = []
+        self.range_order: List[int] = []
+        # Last same-side pivot (simple method)
+        self.last_pivot: Optional[int] = None
+        # Hough candidates with fewer than two supporting points so far
+        self.pending: List[Tuple[Tuple[float, float, int], List[int], int]] = []
+        # Lines that are no longer updated, as (id, slope, intercept, start, events,
+        # supporting points, range order, waiting_for_pivot, potential breakout, breakout point)
+        self.retired: List[tuple] = []
+
+    def add(self, line, supporting_points, range_order, second_pivot=-1):
+        slope, intercept, start = line
+        self.slope = np.append(self.slope, slope)
+        self.intercept = np.append(self.intercept, intercept)
+        self.start = np.append(self.start, start)
+        self.touched = np.append(self.touched, False)
+        self.in_breakout = np.append(self.in_breakout, False)
+        self.waiting_for_pivot = np.append(self.waiting_for_pivot, False)
+        self.potential_breakout = np.append(self.potential_breakout, -1)
+        self.second_pivot = np.append(self.second_pivot, second_pivot)
+        self.breakout_point = np.append(self.breakout_point, -1)
+        self.live = np.append(self.live, True)
+        self.ids = np.append(self.ids, self.next_id)
+        self.next_id += 1
+        self.events.append(TrendlineEvents(touches=set(), breakouts=set(), throwbacks=set(), false_breakouts=set()))
+        self.supporting_points.append(list(supporting_points))
+        self.range_order.append(range_order)
+        return len(self.slope) - 1
+
+    def records(self):
+        """Every line, retired or not, in the same tuple layout as `retired`"""
+        current = [(int(self.ids[i]), self.slope[i], self.intercept[i], int(self.start[i]), self.events[i],
+                    self.supporting_points[i], self.range_order[i], bool(self.waiting_for_pivot[i]),
+                    int(self.potential_breakout[i]), int(self.breakout_point[i]))
+                   for i in range(len(self.slope))]
+        return sorted(self.retired + current, key=lambda record: record[0])
+
+    def compact(self):
+        """Move lines that are no longer live out of the per-bar arrays"""
+        dead = np.flatnonzero(~self.live)
+        if len(dead) < max(64, len(self.live) // 2):
+            return
+        records = self.records()
+        dead_ids = set(self.ids[dead].tolist())
+        self.retired.extend(record for record in records if record[0] in dead_ids)
+        keep = self.live
+        for name in ('slope', 'intercept', 'start', 'touched', 'in_breakout', 'waiting_for_pivot',
+                     'potential_breakout', 'second_pivot', 'breakout_point', 'live', 'ids'):
+            setattr(self, name, getattr(self, name)[keep])
+        rows = np.flatnonzero(keep).tolist()
+        self.events = [self.events[i] for i in rows]
+        self.supporting_points = [self.supporting_points[i] for i in rows]
+        self.range_order = [self.range_order[i] for i in rows]
+
+# Default max_line_age: lines stop being updated after this many bars
+DEFAULT_MAX_LINE_AGE = 5000
+
+class TrendlineEngine:
+    """
+    Stateful trendline detection for bars that arrive one at a time.
+
+    Pivots come from a PivotStream and ATR from an ATRState. A bar is
+    settled once its pivot status is confirmed (`window` bars later) and its
+    ATR is final; each settled bar advances every line's event state machine
+    (in_breakout, waiting_for_pivot, potential_breakout, as in detect_events)
+    in one vectorized step. New candidate lines are only proposed when a
+    pivot is confirmed, and are replayed once from their start to catch up.
+
+    method: 'hough' proposes a line from each main pivot once its
+        future_pivot_ranges window of pivots is complete;
+        'simple' joins every pair of consecutive same-side pivots.
+    max_line_age: stop updating lines that started more than this many bars
+        ago (default DEFAULT_MAX_LINE_AGE), so per-bar work stays bounded by
+        the lines opened in that span. None keeps every line live: results
+        then match the batch functions on any history, but every bar
+        re-checks every line ever opened and per-bar latency grows with it.
+
+    lines() gives the same 4-tuples as hough_transform_trendlines /
+    simple_trendlines for the settled part of the data, up to the events a
+    line would have had after it was retired.
+    """
+    def __init__(self,
+                 window: int = 5,
+                 atr_period: int = 14,
+                 atr_multiplier: float = 0.5,
+                 method: str = 'hough',
+                 future_pivot_ranges: List[int] = [8, 20],
+                 min_score: float = 5.0,
+                 max_false_breakouts: int = 2,
+                 max_line_age: Optional[int] = DEFAULT_MAX_LINE_AGE):
+        if method not in ('hough', 'simple'):
+            raise ValueError(f"Unknown method: {method}")
+        self.window = window
+        self.atr_multiplier = atr_multiplier
+        self.method = method
+        self.future_pivot_ranges = list(future_pivot_ranges)
+        self.min_score = min_score
+        self.max_false_breakouts = max_false_breakouts
+        self.max_line_age = max_line_age
+
+        self.pivot_stream = PivotStream(window)
+        self.atr_state = ATRState(atr_period)
+
+        self.n_bars = 0
+        self.settled = -1
+        self.close = np.empty(1024)
+        self.atr = np.empty(1024)
+        self.is_high_pivot = np.zeros(1024, dtype=bool)
+        self.is_low_pivot = np.zeros(1024, dtype=bool)
+        self.pivots: List[int] = []
+        self.queued_pivots: List[Tuple[int, str]] = []
+
+        self.support = _SideLines(is_support=True)
+        self.resistance = _SideLines(is_support=False)
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, **kwargs) -> 'TrendlineEngine':
+        """Create an engine and feed it every bar of a historical frame"""
+        engine = cls(**kwargs)
+        for high, low, close in zip(df['high'].to_numpy(dtype=float),
+                                    df['low'].to_numpy(dtype=float),
+                                    df['close'].to_numpy(dtype=float)):
+            engine.update(high, low, close)
+        return engine
+
+    def update(self, high: float, low: float, close: float) -> List[Tuple[bool, int, str, int]]:
+        """
+        Add the next bar. Returns the events produced by the bars settled on
+        this update as (is_support, line_id, event, bar) tuples, where event
+        is 'touch', 'throwback', 'breakout' or 'false_breakout' and line_id
+        counts the lines of that side in the order they were added.
+        """
+        idx = self.n_bars
+        self._reserve(idx + 1)
+        self.n_bars += 1
+        self.close[idx] = close
+
+        had_atr = not np.isnan(self.atr_state.first_atr)
+        self.atr[idx] = self.atr_state.update(high, low, close)
+        if not had_atr and not np.isnan(self.atr_state.first_atr):
+            # Back-fill the warm-up bars like calculate_atr does
+            self.atr[:idx] = self.atr_state.first_atr
+
+        pivot = self.pivot_stream.update(close)
+        if pivot is not None:
+            self.queued_pivots.append(pivot)
+
+        new_events = []
+        last_ready = self.n_bars - 1 - self.window
+        if np.isnan(self.atr_state.first_atr):
+            last_ready = -1
+        while self.settled < last_ready:
+            bar = self.settled + 1
+            if self.queued_pivots and self.queued_pivots[0][0] == bar:
+                self._on_pivot(*self.queued_pivots.pop(0))
+            for side in (self.support, self.resistance):
+                new_events.extend(self._step(side, bar))
+            self.settled = bar
+        return new_events
+
+    def lines(self, is_support: bool) -> List[Tuple[float, float, int, TrendlineEvents]]:
+        """Current lines of one side as (slope, intercept, start, events)"""
+        side = self.support if is_support else self.resistance
+        result = []
+        for (_, slope, intercept, start, events, supporting_points, range_order,
+             waiting_for_pivot, potential_breakout, breakout_point) in side.records():
+            if waiting_for_pivot:
+                # A breakout still waiting for its pivot counts as false at the end of data
+                events = TrendlineEvents(touches=set(events.touches), breakouts=set(events.breakouts),
+                                         throwbacks=set(events.throwbacks),
+                                         false_breakouts=events.false_breakouts | {potential_breakout})
+            if self.method == 'simple':
+                events.breakout_point = breakout_point if breakout_point >= 0 else self.settled + 1
+            result.append(((slope, intercept, start, events), supporting_points, range_order))
+
+        if self.method == 'simple':
+            return [line for line, _, _ in result]
+
+        # Same filtering and ordering as hough_transform_trendlines
+        scored = [item for item in result
+                  if len(item[0][3].false_breakouts) <= self.max_false_breakouts
+                  and calculate_trendline_score(item[0][3]) >= self.min_score]
+        scored.sort(key=lambda item: (item[0][2], item[2]))
+
+        final_lines = []
+        accepted_points = []
+        for line, supporting_points, _ in scored:
+            points_set = set(supporting_points)
+            if any(len(points_set & existing) >= 2 for existing in accepted_points):
+                continue
+            final_lines.append(line)
+            accepted_points.append(points_set)
+        return final_lines
+
+    def _reserve(self, size: int):
+        if size <= len(self.close):
+            return
+        capacity = max(size, 2 * len(self.close))
+        for name in ('close', 'atr', 'is_high_pivot', 'is_low_pivot'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _margin(self, bars):
+        return self.atr[bars] * self.atr_multiplier
+
+    def _on_pivot(self, pivot: int, kind: str):
+        """Record a confirmed pivot and propose the lines it completes"""
+        if kind == 'high':
+            self.is_high_pivot[pivot] = True
+        else:
+            self.is_low_pivot[pivot] = True
+        self.pivots.append(pivot)
+
+        if self.method == 'simple':
+            side = self.resistance if kind == 'high' else self.support
+            self._propose_simple(side, pivot)
+            return
+
+        for side in (self.support, self.resistance):
+            if kind == ('low' if side.is_support else 'high'):
+                self._add_supporting_point(side, pivot)
+        self._propose_hough(pivot)
+
+    def _propose_simple(self, side: _SideLines, pivot: int):
+        previous = side.last_pivot
+        side.last_pivot = pivot
+        if previous is None:
+            return
+        x1, x2 = previous, pivot
+        y1, y2 = self.close[x1], self.close[x2]
+        slope = (y2 - y1) / (x2 - x1)
+        intercept = y1 - slope * x1
+
+        # simple_trendlines checks the span with the default 0.5 ATR margin
+        span = np.arange(x1, x2 + 1)
+        y_line = slope * span + intercept
+        margin = self.atr[span] * 0.5
+        if side.is_support:
+            valid = not np.any(self.close[span] < y_line - margin)
+        else:
+            valid = not np.any(self.close[span] > y_line + margin)
+        if valid:
+            line_id = side.add((slope, intercept, int(x1)), [int(x1), int(x2)], 0, second_pivot=int(x2))
+            self._replay(side, line_id, pivot - 1)
+
+    def _propose_hough(self, pivot: int):
+        # Only the last max(future_pivot_ranges) + 1 pivots can be involved
+        max_range = max(self.future_pivot_ranges, default=0)
+        first_seq = max(len(self.pivots) - 1 - max_range, 0)
+        pivot_array = np.array(self.pivots[first_seq:])
+        seq = len(pivot_array) - 1
+        pairs = []
+        for side in (self.support, self.resistance):
+            side_mask = self.is_low_pivot if side.is_support else self.is_high_pivot
+            for order, max_future_pivots in enumerate(self.future_pivot_ranges):
+                main_seq = seq - max_future_pivots
+                if max_future_pivots > 0 and main_seq >= 0 and side_mask[pivot_array[main_seq]]:
+                    pairs.append((side, order, main_seq, max_future_pivots))
+        if not pairs:
+            return
+
+        # The new pivot completes these main points' windows: vote for all of them at once
+        width = max(pair[3] for pair in pairs)
+        main_points = np.zeros((len(pairs), 2))
+        future_points = np.zeros((len(pairs), width, 2))
+        mask = np.zeros((len(pairs), width), dtype=bool)
+        for row, (_, _, main_seq, max_future_pivots) in enumerate(pairs):
+            main_idx = pivot_array[main_seq]
+            future = pivot_array[main_seq + 1:main_seq + 1 + max_future_pivots]
+            main_points[row] = (main_idx, self.close[main_idx])
+            future_points[row, :len(future), 0] = future
+            future_points[row, :len(future), 1] = self.close[future]
+            mask[row, :len(future)] = True
+        thetas, _, _ = hough_transform_batch(main_points, future_points, mask)
+
+        for row, (side, order, main_seq, _) in enumerate(pairs):
+            theta = thetas[row]
+            if np.isnan(theta) or abs(np.sin(theta)) <= 1e-10:
+                continue
+            x_main, y_main = main_points[row]
+            slope = -np.cos(theta) / np.sin(theta)
+            intercept = y_main - slope * x_main
+            line = (slope, intercept, int(x_main))
+
+            side_mask = self.is_low_pivot if side.is_support else self.is_high_pivot
+            candidates = pivot_array[main_seq:]
+            candidates = candidates[side_mask[candidates]]
+            on_line = np.abs(self.close[candidates] - (slope * candidates + intercept)) <= self._margin(candidates)
+            supporting_points = candidates[on_line].tolist()
+
+            if len(supporting_points) >= 2:
+                self._activate(side, line, supporting_points, order)
+            else:
+                side.pending.append((line, supporting_points, order))
+
+    def _add_supporting_point(self, side: _SideLines, pivot: int):
+        """Add a new same-side pivot to the supporting points of the lines it lies on"""
+        margin = self._margin(pivot)
+        if len(side.slope):
+            on_line = (side.start <= pivot) & (
+                np.abs(self.close[pivot] - (side.slope * pivot + side.intercept)) <= margin)
+            for i in np.flatnonzero(on_line):
+                side.supporting_points[i].append(pivot)
+
+        still_pending = []
+        for line, supporting_points, order in side.pending:
+            slope, intercept, start = line
+            if self.max_line_age is not None and pivot - start > self.max_line_age:
+                continue
+            if start <= pivot and abs(self.close[pivot] - (slope * pivot + intercept)) <= margin:
+                supporting_points = supporting_points + [pivot]
+            if len(supporting_points) >= 2:
+                self._activate(side, line, supporting_points, order)
+            else:
+                still_pending.append((line, supporting_points, order))
+        side.pending = still_pending
+
+    def _activate(self, side: _SideLines, line, supporting_points, order):
+        """Check the span between the first two supporting points and start tracking the line"""
+        slope, intercept, _ = line
+        span = np.arange(supporting_points[0], supporting_points[1] + 1)
+        distance = self.close[span] - (slope * span + intercept)
+        margin = self._margin(span)
+        if side.is_support:
+            valid = not np.any(distance < -margin)
+        else:
+            valid = not np.any(distance > margin)
+        if valid:
+            line_id = side.add(line, supporting_points, order)
+            self._replay(side, line_id, self.settled)
+
+    def _replay(self, side: _SideLines, i: int, last_bar: int):
+        """Bring a new line's state machine up to last_bar in one vectorized pass"""
+        start = int(side.start[i])
+        if last_bar < start:
+            return
+        events = side.events[i]
+        bars = np.arange(start, last_bar + 1)
+        distance = self.close[bars] - (side.slope[i] * bars + side.intercept[i])
+        margin = self._margin(bars)
+        within = np.abs(distance) <= margin
+        if side.is_support:
+            touch_pivot, other_pivot = self.is_low_pivot[bars], self.is_high_pivot[bars]
+            beyond = distance < -margin
+        else:
+            touch_pivot, other_pivot = self.is_high_pivot[bars], self.is_low_pivot[bars]
+            beyond = distance > margin
+
+        if side.second_pivot[i] >= 0:
+            self._replay_breakout_point(side, i, last_bar)
+
+        touches = within & touch_pivot
+        if not touches.any():
+            return
+        first_touch = int(np.argmax(touches))
+        side.touched[i] = True
+        events.touches.update((bars[touches]).tolist())
+        throwbacks = within & other_pivot & ~touch_pivot
+        throwbacks[:first_touch + 1] = False
+        events.throwbacks.update((bars[throwbacks]).tolist())
+
+        beyond[:first_touch + 1] = False
+        if not beyond.any():
+            return
+        potential = int(np.argmax(beyond))
+        side.in_breakout[i] = True
+        confirms = np.flatnonzero(other_pivot[potential:])
+        if len(confirms) == 0:
+            side.waiting_for_pivot[i] = True
+            side.potential_breakout[i] = bars[potential]
+            return
+        pivot_pos = potential + confirms[0]
+        if side.is_support:
+            is_valid = distance[pivot_pos] <= margin[pivot_pos]
+        else:
+            is_valid = distance[pivot_pos] >= -margin[pivot_pos]
+        (events.breakouts if is_valid else events.false_breakouts).add(int(bars[potential]))
+
+    def _replay_breakout_point(self, side: _SideLines, i: int, last_bar: int):
+        second = int(side.second_pivot[i])
+        if last_bar < second:
+            return
+        bars = np.arange(second, last_bar + 1)
+        y_line = side.slope[i] * bars + side.intercept[i]
+        margin = self.atr[bars] * 0.5
+        if side.is_support:
+            beyond = self.close[bars] < y_line - margin
+        else:
+            beyond = self.close[bars] > y_line + margin
+        if beyond.any():
+            side.breakout_point[i] = bars[np.argmax(beyond)]
+
+    def _step(self, side: _SideLines, bar: int) -> List[Tuple[bool, int, str, int]]:
+        """Advance every live line of one side by one settled bar"""
+        if len(side.slope) == 0:
+            return []
+        if self.max_line_age is not None:
+            side.live &= bar - side.start <= self.max_line_age
+            side.compact()
+            if len(side.slope) == 0:
+                return []
+
+        price = self.close[bar]
+        margin = self._margin(bar)
+        is_high_pivot = self.is_high_pivot[bar]
+        is_low_pivot = self.is_low_pivot[bar]
+        touch_pivot = is_low_pivot if side.is_support else is_high_pivot
+        confirm_pivot = is_high_pivot if side.is_support else is_low_pivot
+
+        active = side.live & (side.start <= bar)
+        distance = price - (side.slope * bar + side.intercept)
+        within = np.abs(distance) <= margin
+        beyond = distance < -margin if side.is_support else distance > margin
+        new_events = []
+
+        def record(rows, name, target):
+            for row in np.flatnonzero(rows):
+                getattr(side.events[row], target).add(bar)
+                new_events.append((side.is_support, int(side.ids[row]), name, bar))
+
+        if side.second_pivot.max() >= 0:
+            if side.is_support:
+                breaks = price < (side.slope * bar + side.intercept) - self.atr[bar] * 0.5
+            else:
+                breaks = price > (side.slope * bar + side.intercept) + self.atr[bar] * 0.5
+            first_break = active & (side.second_pivot >= 0) & (side.second_pivot <= bar) & (side.breakout_point < 0) & breaks
+            side.breakout_point[first_break] = bar
+
+        # Find first touch to establish the line
+        if touch_pivot:
+            first_touch = active & ~side.touched & within
+            side.touched |= first_touch
+            record(first_touch, 'touch', 'touches')
+        else:
+            first_touch = np.zeros(len(side.slope), dtype=bool)
+        tracking = active & side.touched & ~first_touch
+
+        # Within margin of line
+        if touch_pivot:
+            record(tracking & within, 'touch', 'touches')
+        elif confirm_pivot:
+            record(tracking & within, 'throwback', 'throwbacks')
+
+        # Beyond margin
+        opened = tracking & beyond & ~side.in_breakout & ~side.waiting_for_pivot
+        side.potential_breakout[opened] = bar
+        side.waiting_for_pivot |= opened
+        side.in_breakout |= opened
+
+        # Check for pivot confirmation after potential breakout
+        if confirm_pivot:
+            resolving = tracking & side.waiting_for_pivot
+            valid = distance <= margin if side.is_support else distance >= -margin
+            for row in np.flatnonzero(resolving):
+                breakout = int(side.potential_breakout[row])
+                if valid[row]:
+                    side.events[row].breakouts.add(breakout)
+                    new_events.append((side.is_support, int(side.ids[row]), 'breakout', breakout))
+                else:
+                    side.events[row].false_breakouts.add(breakout)
+                    new_events.append((side.is_support, int(side.ids[row]), 'false_breakout', breakout))
+            side.waiting_for_pivot[resolving] = False
+            side.potential_breakout[resolving] = -1
+
+        return new_events
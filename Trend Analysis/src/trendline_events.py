@@ -1,8 +1,10 @@
 from dataclasses import dataclass
-from typing import List, Set, Tuple
+from typing import List, Set, Tuple, Optional
 import pandas as pd
 import numpy as np
 from .utils import calculate_atr
+from .price_context import PriceContext
+from .pipeline_stats import PipelineStats
 
 @dataclass
 class TrendlineEvents:
@@ -10,9 +12,15 @@ class TrendlineEvents:
     breakouts: Set[int]
     throwbacks: Set[int]
     false_breakouts: Set[int]
+    # First close beyond the margin after the line's second pivot
+    # (set by simple_trendlines, len(df) when the line never breaks)
+    breakout_point: Optional[int] = None
 
-def get_dynamic_margin(df: pd.DataFrame, index: int, atr_multiplier: float = 0.5) -> float:
+def get_dynamic_margin(df: pd.DataFrame, index: int, atr_multiplier: float = 0.5,
+                       ctx: Optional[PriceContext] = None) -> float:
     """Calculate dynamic margin based on ATR at a given index"""
+    if ctx is not None:
+        return ctx.margin(atr_multiplier)[index]
     if not hasattr(df, 'atr'):
         df['atr'] = calculate_atr(df)
     return df['atr'].iloc[index] * atr_multiplier
@@ -22,7 +30,9 @@ def detect_events(line: Tuple[float, float, int],
                  high_pivots: List[int],
                  low_pivots: List[int],
                  is_support: bool,
-                 atr_multiplier: float = 0.5) -> TrendlineEvents:
+                 atr_multiplier: float = 0.5,
+                 ctx: Optional[PriceContext] = None,
+                 stats: Optional[PipelineStats] = None) -> TrendlineEvents:
     """
     Detect trendline events according to the following rules:
     1. Touch: Pivot point formed within margin of trendline
@@ -40,12 +50,28 @@ def detect_events(line: Tuple[float, float, int],
     4. Throwback: Price returns to line after valid breakout
        - Support line: High pivot within margin
        - Resistance line: Low pivot within margin
+       
+    ctx: prebuilt PriceContext; when given, prices, margins and pivot
+    flags are read from it instead of df/high_pivots/low_pivots.
+    stats: optional PipelineStats counting the line and the bars from its
+    start to the end (see PipelineStats.event_span_bars).
     """
     slope, intercept, start_point = line
     
     # Ensure ATR is calculated
-    if not hasattr(df, 'atr'):
-        df['atr'] = calculate_atr(df)
+    if ctx is None:
+        if not hasattr(df, 'atr'):
+            df['atr'] = calculate_atr(df)
+        ctx = PriceContext.from_df(df, high_pivots, low_pivots)
+    
+    close = ctx.close
+    margins = ctx.margin(atr_multiplier)
+    high_mask = ctx.is_high_pivot
+    low_mask = ctx.is_low_pivot
+    n_bars = len(ctx)
+    if stats is not None:
+        stats.event_lines += 1
+        stats.event_span_bars += max(n_bars - start_point, 0)
     
     events = TrendlineEvents(
         touches=set(),
@@ -54,96 +80,272 @@ def detect_events(line: Tuple[float, float, int],
         false_breakouts=set()
     )
     
+    # Signed distance and margin for every bar from the line start
+    bars = np.arange(start_point, n_bars)
+    distance = close[start_point:] - (slope * bars + intercept)
+    margin = margins[start_point:]
+    within = np.abs(distance) <= margin
+    if is_support:
+        beyond = distance < -margin
+        touch_pivot, other_pivot = low_mask[start_point:], high_mask[start_point:]
+        confirm_pivots = ctx.high_pivots
+    else:
+        beyond = distance > margin
+        touch_pivot, other_pivot = high_mask[start_point:], low_mask[start_point:]
+        confirm_pivots = ctx.low_pivots
+    
     # Find first touch to establish the line
-    first_touch = None
-    for idx in range(start_point, len(df)):
-        price = df['close'].iloc[idx]
-        line_value = slope * idx + intercept
-        margin = get_dynamic_margin(df, idx, atr_multiplier)
-        distance = price - line_value
-        
-        if abs(distance) <= margin:
-            if (is_support and idx in low_pivots) or (not is_support and idx in high_pivots):
-                events.touches.add(idx)
-                first_touch = idx
-                break
+    touch_mask = within & touch_pivot
+    if not touch_mask.any():
+        return events
+    first_touch = int(np.argmax(touch_mask))
+    
+    # Touch: same-side pivot within margin
+    # Throwback: opposite-side pivot within margin after the first touch
+    events.touches.update((np.flatnonzero(touch_mask) + start_point).tolist())
+    throwback_mask = within & other_pivot & ~touch_pivot
+    throwback_mask[:first_touch + 1] = False
+    events.throwbacks.update((np.flatnonzero(throwback_mask) + start_point).tolist())
     
-    if first_touch is None:
+    # Only the first close beyond the margin after the first touch opens a
+    # potential breakout; later ones are ignored once in breakout
+    beyond[:first_touch + 1] = False
+    if not beyond.any():
+        return events
+    potential_breakout = int(np.argmax(beyond)) + start_point
+    
+    # The next confirming pivot (high for support, low for resistance) at or
+    # after the breakout decides whether it was valid
+    pos = np.searchsorted(confirm_pivots, potential_breakout)
+    if pos == len(confirm_pivots):
+        # Handle any remaining potential breakout at end of data
+        events.false_breakouts.add(potential_breakout)
         return events
+    
+    pivot_idx = confirm_pivots[pos]
+    pivot_distance = distance[pivot_idx - start_point]
+    pivot_margin = margin[pivot_idx - start_point]
+    if is_support:
+        # Valid breakout: high pivot below/within margin
+        is_valid = pivot_distance <= pivot_margin
+    else:
+        # Valid breakout: low pivot above/within margin
+        is_valid = pivot_distance >= -pivot_margin
+    
+    if is_valid:
+        events.breakouts.add(potential_breakout)
+    else:
+        events.false_breakouts.add(potential_breakout)
+    
+    return events
 
-    # Track state
-    in_breakout = False
-    potential_breakout = None
-    had_valid_breakout = False
-    waiting_for_pivot = False
-    
-    # Process all candles after first touch
-    for idx in range(first_touch + 1, len(df)):
-        price = df['close'].iloc[idx]
-        line_value = slope * idx + intercept
-        margin = get_dynamic_margin(df, idx, atr_multiplier)
-        distance = price - line_value
+def find_first_breakouts(slopes: np.ndarray,
+                         intercepts: np.ndarray,
+                         starts: np.ndarray,
+                         ctx: PriceContext,
+                         is_support: bool,
+                         atr_multiplier: float = 0.5,
+                         block_size: int = 256,
+                         max_cells: int = 2 ** 22) -> np.ndarray:
+    """
+    First bar at or after each line's start where the close is beyond the
+    line by more than the ATR margin (len(ctx) if it never happens).
+    
+    Bars are grouped in blocks with the min of close + margin (support) or
+    max of close - margin (resistance) per block. A line can only break in a
+    block where its value at one of the block ends crosses that bound, so
+    only those candidate blocks are checked bar by bar.
+    """
+    close = ctx.close
+    margins = ctx.margin(atr_multiplier)
+    n_bars = len(ctx)
+    slopes = np.asarray(slopes, dtype=float)
+    intercepts = np.asarray(intercepts, dtype=float)
+    starts = np.asarray(starts, dtype=int)
+    breakouts = np.full(len(starts), n_bars)
+    if n_bars == 0 or len(starts) == 0:
+        return breakouts
+    
+    block_lo = np.arange(0, n_bars, block_size)
+    block_hi = np.minimum(block_lo + block_size, n_bars) - 1
+    if is_support:
+        bound = np.minimum.reduceat(close + margins, block_lo)
+    else:
+        bound = np.maximum.reduceat(close - margins, block_lo)
+    tolerance = 1e-9 * (np.abs(bound) + 1.0)
+    block_ids = np.arange(len(block_lo))
+    offsets = np.arange(block_size)
+    
+    rows_per_chunk = max(1, max_cells // len(block_lo))
+    for chunk_start in range(0, len(starts), rows_per_chunk):
+        rows = np.arange(chunk_start, min(chunk_start + rows_per_chunk, len(starts)))
+        rows = rows[starts[rows] < n_bars]
         
-        is_high_pivot = idx in high_pivots
-        is_low_pivot = idx in low_pivots
+        # Candidate blocks for every line in the chunk
+        value_lo = slopes[rows, None] * block_lo + intercepts[rows, None]
+        value_hi = slopes[rows, None] * block_hi + intercepts[rows, None]
+        if is_support:
+            candidate = np.maximum(value_lo, value_hi) > bound - tolerance
+        else:
+            candidate = np.minimum(value_lo, value_hi) < bound + tolerance
         
-        # Within margin of line
-        if abs(distance) <= margin:
-            # if not waiting_for_pivot:
-            if is_support:
-                if is_low_pivot:# and not had_valid_breakout:
-                    # Touch: Low pivot within margin (support)
-                    events.touches.add(idx)
-                elif is_high_pivot:# and had_valid_breakout:
-                    # Throwback: High pivot within margin after breakout (support)
-                    events.throwbacks.add(idx)
-            else:  # Resistance
-                if is_high_pivot:# and not had_valid_breakout:
-                    # Touch: High pivot within margin (resistance)
-                    events.touches.add(idx)
-                elif is_low_pivot:# and had_valid_breakout:
-                    # Throwback: Low pivot within margin after breakout (resistance)
-                    events.throwbacks.add(idx)
-                        
-        # Beyond margin
-        elif (is_support and distance < -margin) or (not is_support and distance > margin):
-            if not in_breakout and not waiting_for_pivot:
-                potential_breakout = idx
-                waiting_for_pivot = True
-                in_breakout = True
-                
-        # Check for pivot confirmation after potential breakout
-        if waiting_for_pivot:
+        current = starts[rows] // block_size
+        pending = np.arange(len(rows))
+        while len(pending):
+            # Next candidate block of every pending line
+            remaining = candidate[pending] & (block_ids >= current[pending, None])
+            has_block = remaining.any(axis=1)
+            pending = pending[has_block]
+            if len(pending) == 0:
+                break
+            next_block = np.argmax(remaining[has_block], axis=1)
+            
+            # Exact check of the bars in that block
+            line_rows = rows[pending]
+            bars = block_lo[next_block, None] + offsets
+            in_range = (bars < n_bars) & (bars >= starts[line_rows, None])
+            bars = np.minimum(bars, n_bars - 1)
+            y_line = slopes[line_rows, None] * bars + intercepts[line_rows, None]
             if is_support:
-                if is_high_pivot:
-                    # Check if high pivot is below or within margin
-                    pivot_distance = price - (slope * idx + intercept)
-                    if pivot_distance <= margin:
-                        # Valid breakout: high pivot below/within margin
-                        events.breakouts.add(potential_breakout)
-                        had_valid_breakout = True
-                    else:
-                        # False breakout: high pivot above line
-                        events.false_breakouts.add(potential_breakout)
-                    waiting_for_pivot = False
-                    potential_breakout = None
-            else:  # Resistance
-                if is_low_pivot:
-                    # Check if low pivot is above or within margin
-                    pivot_distance = price - (slope * idx + intercept)
-                    if pivot_distance >= -margin:
-                        # Valid breakout: low pivot above/within margin
-                        events.breakouts.add(potential_breakout)
-                        had_valid_breakout = True
-                    else:
-                        # False breakout: low pivot below line
-                        events.false_breakouts.add(potential_breakout)
-                    waiting_for_pivot = False
-                    potential_breakout = None
-    
-    # Handle any remaining potential breakout at end of data
-    if potential_breakout is not None:
-        events.false_breakouts.add(potential_breakout)
+                beyond = close[bars] < y_line - margins[bars]
+            else:
+                beyond = close[bars] > y_line + margins[bars]
+            beyond &= in_range
+            
+            found = beyond.any(axis=1)
+            breakouts[line_rows[found]] = bars[found, np.argmax(beyond[found], axis=1)]
+            current[pending] = next_block + 1
+            pending = pending[~found]
+    
+    return breakouts
+
+def detect_events_batch(lines,
+                        ctx: PriceContext,
+                        is_support: bool,
+                        atr_multiplier: float = 0.5,
+                        block_size: int = 64,
+                        max_cells: int = 2 ** 22,
+                        stats: Optional[PipelineStats] = None) -> List[TrendlineEvents]:
+    """
+    Detect events for many lines at once, with the same rules as detect_events.
+    
+    lines: sequence of (slope, intercept, start_point) triples or an (L, 3) array
+    max_cells: upper bound on the size of each distance block
+    
+    Touches and throwbacks can only happen on pivot bars. Pivots are grouped
+    in blocks with the price band close -/+ margin of each block, and a line
+    is only checked against the blocks its value range overlaps. Breakouts
+    are found with find_first_breakouts from the bar after the first touch.
+    
+    stats: optional PipelineStats counting the lines and the bars from their
+    starts to the end, as detect_events does.
+    
+    Returns one TrendlineEvents per line, in input order.
+    """
+    lines = np.asarray(lines, dtype=float).reshape(-1, 3)
+    slopes = lines[:, 0]
+    intercepts = lines[:, 1]
+    starts = lines[:, 2].astype(int)
+    n_lines = len(lines)
+    n_bars = len(ctx)
+    if stats is not None:
+        stats.event_lines += n_lines
+        stats.event_span_bars += int(np.maximum(n_bars - starts, 0).sum())
+    
+    close = ctx.close
+    margins = ctx.margin(atr_multiplier)
+    if is_support:
+        touch_pivot, confirm_pivots = ctx.is_low_pivot, ctx.high_pivots
+    else:
+        touch_pivot, confirm_pivots = ctx.is_high_pivot, ctx.low_pivots
+    
+    events = [TrendlineEvents(touches=set(), breakouts=set(), throwbacks=set(), false_breakouts=set())
+              for _ in range(n_lines)]
+    pivots = np.flatnonzero(ctx.is_high_pivot | ctx.is_low_pivot)
+    if n_lines == 0 or len(pivots) == 0:
+        return events
+    
+    # Price band of every block of pivots
+    block_lo = np.arange(0, len(pivots), block_size)
+    block_hi = np.minimum(block_lo + block_size, len(pivots)) - 1
+    band_low = np.minimum.reduceat(close[pivots] - margins[pivots], block_lo)
+    band_high = np.maximum.reduceat(close[pivots] + margins[pivots], block_lo)
+    tolerance = 1e-9 * (np.abs(band_low) + np.abs(band_high) + 1.0)
+    first_bar, last_bar = pivots[block_lo], pivots[block_hi]
+    offsets = np.arange(block_size)
+    
+    # All (line, pivot) pairs within margin of the line
+    hit_lines = []
+    hit_bars = []
+    rows_per_chunk = max(1, max_cells // len(block_lo))
+    for chunk_start in range(0, n_lines, rows_per_chunk):
+        rows = np.arange(chunk_start, min(chunk_start + rows_per_chunk, n_lines))
+        value_first = slopes[rows, None] * first_bar + intercepts[rows, None]
+        value_last = slopes[rows, None] * last_bar + intercepts[rows, None]
+        overlaps = ((np.maximum(value_first, value_last) >= band_low - tolerance)
+                    & (np.minimum(value_first, value_last) <= band_high + tolerance)
+                    & (last_bar >= starts[rows, None]))
+        pair_rows, pair_blocks = np.nonzero(overlaps)
+        pair_rows = rows[pair_rows]
+        
+        pairs_per_chunk = max(1, max_cells // block_size)
+        for pair_start in range(0, len(pair_rows), pairs_per_chunk):
+            line_rows = pair_rows[pair_start:pair_start + pairs_per_chunk]
+            cols = block_lo[pair_blocks[pair_start:pair_start + pairs_per_chunk], None] + offsets
+            in_range = cols < len(pivots)
+            bars = pivots[np.minimum(cols, len(pivots) - 1)]
+            
+            distance = close[bars] - (slopes[line_rows, None] * bars + intercepts[line_rows, None])
+            within = (np.abs(distance) <= margins[bars]) & in_range & (bars >= starts[line_rows, None])
+            
+            hit_row, hit_col = np.nonzero(within)
+            hit_lines.append(line_rows[hit_row])
+            hit_bars.append(bars[hit_row, hit_col])
+    
+    hit_lines = np.concatenate(hit_lines) if hit_lines else np.array([], dtype=int)
+    hit_bars = np.concatenate(hit_bars) if hit_bars else np.array([], dtype=int)
+    
+    # Touch: same-side pivot within margin; the first one establishes the line
+    is_touch = touch_pivot[hit_bars]
+    first_touch = np.full(n_lines, n_bars)
+    np.minimum.at(first_touch, hit_lines[is_touch], hit_bars[is_touch])
+    
+    # Throwback: opposite-side pivot within margin after the first touch
+    is_throwback = ~is_touch & (hit_bars > first_touch[hit_lines])
+    
+    for row, bar in zip(hit_lines[is_touch].tolist(), hit_bars[is_touch].tolist()):
+        events[row].touches.add(bar)
+    for row, bar in zip(hit_lines[is_throwback].tolist(), hit_bars[is_throwback].tolist()):
+        events[row].throwbacks.add(bar)
+    
+    # Only the first close beyond the margin after the first touch opens a
+    # potential breakout
+    touched = np.flatnonzero(first_touch < n_bars)
+    breakout = find_first_breakouts(slopes[touched], intercepts[touched], first_touch[touched] + 1,
+                                    ctx, is_support, atr_multiplier)
+    broken = touched[breakout < n_bars]
+    breakout = breakout[breakout < n_bars]
+    
+    # Confirm each potential breakout with the next opposite pivot
+    pos = np.searchsorted(confirm_pivots, breakout)
+    confirmed = pos < len(confirm_pivots)
+    
+    valid = np.zeros(len(broken), dtype=bool)
+    if confirmed.any():
+        rows = broken[confirmed]
+        pivot_bars = confirm_pivots[pos[confirmed]]
+        pivot_distance = close[pivot_bars] - (slopes[rows] * pivot_bars + intercepts[rows])
+        pivot_margin = margins[pivot_bars]
+        if is_support:
+            valid[confirmed] = pivot_distance <= pivot_margin
+        else:
+            valid[confirmed] = pivot_distance >= -pivot_margin
+    
+    for row, bar, is_valid in zip(broken.tolist(), breakout.tolist(), valid.tolist()):
+        if is_valid:
+            events[row].breakouts.add(bar)
+        else:
+            events[row].false_breakouts.add(bar)
     
     return events
 
@@ -1,9 +1,21 @@
 import pandas as pd
 import numpy as np
+import math
+from collections import deque
+from .data_cache import load_cached
+from .csv_loader import read_ohlc
 
-def load_data(filename: str) -> pd.DataFrame:
-    """Load data from CSV file"""
-    df = pd.read_csv(filename)
+def load_data(filename: str, use_cache: bool = True, **read_options) -> pd.DataFrame:
+    """
+    Load data from CSV file with typed columns and an int64 'epoch' column.
+    With use_cache the file is parsed once into a columnar cache next to it
+    and memory-mapped on later loads. read_options (nrows, start, end,
+    price_dtype, chunksize, keep_time) are passed to read_ohlc and bypass
+    the cache.
+    """
+    if use_cache and not read_options:
+        return load_cached(filename)
+    df = read_ohlc(filename, **read_options)
     return df
 
 def pointpos(x: pd.Series) -> float:
@@ -25,15 +37,17 @@ def calculate_true_range(df: pd.DataFrame) -> pd.Series:
     2. |Current High - Previous Close|
     3. |Current Low - Previous Close|
     """
-    high = df['high']
-    low = df['low']
-    close = df['close']
+    high = df['high'].to_numpy(dtype=float)
+    low = df['low'].to_numpy(dtype=float)
+    close = df['close'].to_numpy(dtype=float)
+    prev_close = np.concatenate([[np.nan], close[:-1]])
     
     tr1 = high - low
-    tr2 = abs(high - close.shift())
-    tr3 = abs(low - close.shift())
+    tr2 = np.abs(high - prev_close)
+    tr3 = np.abs(low - prev_close)
     
-    return pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    # fmax skips the missing previous close on the first bar
+    return pd.Series(np.fmax(tr1, np.fmax(tr2, tr3)), index=df.index)
 
 def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
     """
@@ -55,9 +69,9 @@ def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
     atr = tr.rolling(window=period).mean()
     
     # Fill NaN values with first valid ATR value
-    return atr.fillna(method='bfill')
+    return atr.bfill()
 
-def prepare_data_with_atr(df: pd.DataFrame, atr_period: int = 14) -> pd.DataFrame:
+def prepare_data_with_atr(df: pd.DataFrame, atr_period: int = 14, inplace: bool = False) -> pd.DataFrame:
     """
     Prepare DataFrame with ATR calculations
     
@@ -67,12 +81,94 @@ def prepare_data_with_atr(df: pd.DataFrame, atr_period: int = 14) -> pd.DataFram
         Input DataFrame with price data
     atr_period : int, optional
         Period for ATR calculation, default is 14
+    inplace : bool, optional
+        Add the column to df itself instead of a copy, default is False
         
     Returns:
     --------
     pd.DataFrame
         DataFrame with added ATR column
     """
-    df = df.copy()
+    if not inplace:
+        df = df.copy()
     df['atr'] = calculate_atr(df, atr_period)
-    return df
\ No newline at end of file
+    return df
+
+class ATRState:
+    """
+    Incremental ATR for append-only data.
+    
+    Keeps the previous close and the last `period` True Range values with
+    their running sum, so each new bar is O(1). The running sum is
+    recomputed exactly once per `period` bars to stop rounding drift.
+    
+    Values match calculate_atr to floating-point precision from bar
+    period - 1 on. The batch version back-fills the first period - 1 bars
+    with the first full-window ATR; update() returns NaN for them instead,
+    and that first value is kept in `first_atr` once it is known.
+    """
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.window_sum = 0.0
+        self.nan_count = 0
+        self.prev_close = np.nan
+        self.n_bars = 0
+        self.atr = np.nan
+        self.first_atr = np.nan
+    
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, period: int = 14) -> 'ATRState':
+        """Seed the state from historical bars, reading only the last period + 1 rows"""
+        state = cls(period)
+        tail = df.iloc[-(period + 1):]
+        tr = calculate_true_range(tail).to_numpy()
+        
+        # The first tail row lacks its previous close unless it is the first bar
+        start = 1 if len(df) > len(tail) else 0
+        for value in tr[start:]:
+            state._push(value)
+        state.prev_close = float(tail['close'].iloc[-1]) if len(tail) else np.nan
+        state.n_bars = len(df)
+        if len(df) >= period:
+            state.atr = state._mean()
+            state.first_atr = calculate_atr(df.iloc[:period], period).iloc[-1]
+        return state
+    
+    def update(self, high: float, low: float, close: float) -> float:
+        """Add the next bar and return its ATR (NaN during the first period - 1 bars)"""
+        tr = high - low
+        if not math.isnan(self.prev_close):
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.n_bars += 1
+        
+        self._push(tr)
+        if self.n_bars % self.period == 0:
+            self._resync()
+        
+        self.atr = self._mean() if self.n_bars >= self.period else np.nan
+        if math.isnan(self.first_atr) and self.n_bars >= self.period:
+            self.first_atr = self.atr
+        return self.atr
+    
+    def _push(self, tr: float):
+        if len(self.window) == self.period:
+            old = self.window[0]
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self.window_sum -= old
+        self.window.append(tr)
+        if math.isnan(tr):
+            self.nan_count += 1
+        else:
+            self.window_sum += tr
+    
+    def _resync(self):
+        self.window_sum = math.fsum(v for v in self.window if not math.isnan(v))
+    
+    def _mean(self) -> float:
+        if self.nan_count or len(self.window) < self.period:
+            return np.nan
+        return self.window_sum / self.period
\ No newline at end of file
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+from typing import List, Tuple, Dict, Optional
+from .pivot_detection import get_pivot_points
+from .trendline_detection import (simple_trendlines, hough_candidates, score_hough_candidates,
+                                  filter_hough_lines)
+from .trendline_events import detect_events_batch
+from .price_context import PriceContext, pivot_mask
+from .backtest import EntrySchedule, run_backtest, trade_stats, trades_frame
+from .pipeline import AnalysisConfig, summarize_trades
+from .utils import prepare_data_with_atr
+
+def walk_forward_folds(n_bars: int, train_size: int, test_size: int,
+                       step: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """
+    (train_start, test_start, test_end) of every fold: a train segment of
+    train_size bars followed by a test segment of test_size bars, moved
+    forward by step bars (default test_size, so test segments don't overlap)
+    """
+    step = step or test_size
+    folds = []
+    start = 0
+    while start + train_size + test_size <= n_bars:
+        folds.append((start, start + train_size, start + train_size + test_size))
+        start += step
+    return folds
+
+def slice_context(ctx: PriceContext,
+                  high_pivots: np.ndarray,
+                  low_pivots: np.ndarray,
+                  start: int,
+                  stop: int,
+                  window: int) -> Tuple[PriceContext, np.ndarray, np.ndarray]:
+    """
+    Context of bars [0, stop) that only knows the pivots from start on which
+    are confirmed by bar stop - 1, i.e. have `window` bars after them.
+    Price arrays and cached margins are views of ctx, so nothing is recomputed.
+    Returns the context and its high and low pivots.
+    """
+    last = stop - 1 - window
+    high = high_pivots[(high_pivots >= start) & (high_pivots <= last)]
+    low = low_pivots[(low_pivots >= start) & (low_pivots <= last)]
+    sub = PriceContext(
+        close=ctx.close[:stop],
+        high=ctx.high[:stop],
+        low=ctx.low[:stop],
+        atr=ctx.atr[:stop],
+        is_high_pivot=pivot_mask(high, stop),
+        is_low_pivot=pivot_mask(low, stop),
+        margins={multiplier: margin[:stop] for multiplier, margin in ctx.margins.items()}
+    )
+    return sub, high, low
+
+class _CandidateCache:
+    """
+    Hough candidates of one side computed once on all pivots.
+
+    A main point's candidates only depend on the next future_pivot_ranges
+    pivots after it, so they can be reused in every train segment holding
+    all of those pivots. Only the main points near the end of a segment are
+    recomputed on the pivots of that segment.
+    """
+    def __init__(self, main_pivots: np.ndarray, high_pivots: np.ndarray, low_pivots: np.ndarray,
+                 close: np.ndarray, future_pivot_ranges: Tuple[int, ...]):
+        self.close = close
+        self.ranges = list(future_pivot_ranges)
+        self.max_range = max(self.ranges, default=0)
+        self.all_pivots = np.union1d(high_pivots, low_pivots)
+        self.by_main: Dict[int, List[Tuple]] = {}
+        for candidate in hough_candidates(main_pivots, close, high_pivots, low_pivots, self.ranges):
+            self.by_main.setdefault(int(candidate[1]), []).append(candidate)
+
+    def candidates(self, main_pivots: np.ndarray, high_pivots: np.ndarray,
+                   low_pivots: np.ndarray) -> List[Tuple]:
+        """Candidates for a segment's main pivots, as hough_candidates would return them"""
+        segment_pivots = np.union1d(high_pivots, low_pivots)
+        if len(main_pivots) == 0:
+            return []
+        # Global sequence number of the segment's last pivot and of each main point
+        last_seq = int(np.searchsorted(self.all_pivots, segment_pivots[-1]))
+        main_seqs = np.searchsorted(self.all_pivots, main_pivots)
+        if last_seq == len(self.all_pivots) - 1:
+            reusable = np.ones(len(main_pivots), dtype=bool)
+        else:
+            reusable = main_seqs + self.max_range <= last_seq
+
+        candidates = []
+        for main_idx in main_pivots[reusable].tolist():
+            candidates.extend(self.by_main.get(main_idx, []))
+        tail = main_pivots[~reusable]
+        if len(tail):
+            candidates.extend(hough_candidates(tail, self.close, high_pivots, low_pivots, self.ranges))
+        return candidates
+
+def _train_lines(df: pd.DataFrame, ctx: PriceContext, high: np.ndarray, low: np.ndarray,
+                 config: AnalysisConfig, caches: Optional[Tuple[_CandidateCache, _CandidateCache]]):
+    if config.method == 1:
+        support_lines = simple_trendlines(low, df, True, high, low,
+                                          atr_multiplier=config.atr_multiplier, ctx=ctx)
+        resistance_lines = simple_trendlines(high, df, False, high, low,
+                                             atr_multiplier=config.atr_multiplier, ctx=ctx)
+        return support_lines, resistance_lines
+
+    sides = []
+    for is_support, main_pivots, cache in ((True, low, caches[0]), (False, high, caches[1])):
+        candidates = cache.candidates(main_pivots, high, low)
+        scored = score_hough_candidates(candidates, main_pivots, df, is_support,
+                                        config.atr_multiplier, ctx=ctx)
+        sides.append(filter_hough_lines(scored, config.min_score))
+    return sides[0], sides[1]
+
+def _test_lines(lines: List[Tuple], ctx: PriceContext, is_support: bool,
+                atr_multiplier: float) -> List[Tuple]:
+    """The trained lines with their events redetected up to the end of the test segment"""
+    events = detect_events_batch([line[:3] for line in lines], ctx, is_support, atr_multiplier)
+    return [(line[0], line[1], line[2], line_events) for line, line_events in zip(lines, events)]
+
+def run_walk_forward(df: pd.DataFrame,
+                     train_size: int,
+                     test_size: int,
+                     step: Optional[int] = None,
+                     config: AnalysisConfig = AnalysisConfig()) -> Dict:
+    """
+    Walk-forward analysis: detect trendlines on each train segment and trade
+    their throwbacks in the following test segment only.
+
+    Pivots and ATR are computed once for the whole history and every
+    segment sees only the pivots confirmed within it. A test trade enters
+    event_window bars after its throwback, but never before the throwback
+    pivot is confirmed (window bars after it). Hough candidates are
+    computed once and reused across overlapping segments. A position still
+    open at the end of a test segment is closed there with result 'OPEN'.
+
+    Returns {'folds': one row per fold, 'trades': trade table with a fold
+    column, 'trade_stats': statistics of all test trades (or None)}.
+    """
+    df = prepare_data_with_atr(df, config.atr_period)
+    high_pivots, low_pivots = get_pivot_points(df, window=config.window)
+    ctx = PriceContext.from_df(df, high_pivots, low_pivots)
+    ctx.margin(config.atr_multiplier)
+    ctx.margin()
+
+    caches = None
+    if config.method != 1:
+        ranges = tuple(config.future_pivot_ranges)
+        caches = (_CandidateCache(low_pivots, high_pivots, low_pivots, ctx.close, ranges),
+                  _CandidateCache(high_pivots, high_pivots, low_pivots, ctx.close, ranges))
+
+    fold_rows = []
+    all_trades = []
+    fold_ids = []
+    for fold, (train_start, test_start, test_end) in enumerate(
+            walk_forward_folds(len(df), train_size, test_size, step)):
+        train_ctx, high, low = slice_context(ctx, high_pivots, low_pivots,
+                                             train_start, test_start, config.window)
+        support_lines, resistance_lines = _train_lines(df, train_ctx, high, low, config, caches)
+
+        test_ctx, _, _ = slice_context(ctx, high_pivots, low_pivots,
+                                       train_start, test_end, config.window)
+        support_lines = _test_lines(support_lines, test_ctx, True, config.atr_multiplier)
+        resistance_lines = _test_lines(resistance_lines, test_ctx, False, config.atr_multiplier)
+
+        # Test throwbacks are pivots, so a trade enters no earlier than their confirmation
+        schedule = EntrySchedule.from_lines(support_lines, resistance_lines, config.event_window,
+                                            confirm_window=config.window)
+        trades = run_backtest(
+            schedule.between(test_start, test_end),
+            test_ctx.high, test_ctx.low, test_ctx.close, test_ctx.atr,
+            reward_ratio=config.reward_ratio,
+            atr_multiplier=config.trade_atr_multiplier,
+            risk_per_trade=config.risk_per_trade
+        )
+        stats = summarize_trades(trade_stats(trades))
+        fold_rows.append({
+            'fold': fold,
+            'train_start': train_start,
+            'test_start': test_start,
+            'test_end': test_end,
+            'support_lines': len(support_lines),
+            'resistance_lines': len(resistance_lines),
+            'total_trades': stats['total_trades'],
+            'win_count': stats['win_count'],
+            'loss_count': stats['loss_count'],
+            'win_rate': stats['win_rate'],
+            'total_pnl': stats['total_pnl'],
+        })
+        all_trades.extend(trades)
+        fold_ids.extend([fold] * len(trades))
+
+    trades = trades_frame(all_trades)
+    trades.insert(0, 'fold', pd.Series(fold_ids, dtype=int))
+    return {
+        'folds': pd.DataFrame(fold_rows),
+        'trades': trades,
+        'trade_stats': trade_stats(all_trades)
+    }
@@ -0,0 +1,31 @@
+import numpy as np
+from src.backtest import EntrySchedule, run_backtest
+from src.trendline_events import TrendlineEvents
+
+def _bars(close):
+    close = np.asarray(close, dtype=float)
+    return close + 0.5, close - 0.5, close, np.full(len(close), 1.0)
+
+def test_short_stop_loss_is_a_loss():
+    # SHORT at 100 with the stop at 101, then the price rises through it
+    high, low, close, atr = _bars([100.0, 100.0, 102.0, 103.0])
+    trades = run_backtest(EntrySchedule(np.array([0]), np.array([True])), high, low, close, atr,
+                          reward_ratio=2.0, atr_multiplier=1.0, risk_per_trade=100.0)
+    assert len(trades) == 1
+    assert trades[0]['type'] == 'SHORT'
+    assert trades[0]['result'] == 'SL'
+    assert trades[0]['profit'] == -100.0
+
+def test_short_take_profit_is_a_win():
+    high, low, close, atr = _bars([100.0, 99.0, 97.0, 96.0])
+    trades = run_backtest(EntrySchedule(np.array([0]), np.array([True])), high, low, close, atr,
+                          reward_ratio=2.0, atr_multiplier=1.0, risk_per_trade=100.0)
+    assert trades[0]['result'] == 'TP'
+    assert trades[0]['profit'] == 200.0
+
+def test_entries_wait_for_the_throwback_pivot_confirmation():
+    line = (0.0, 100.0, 10, TrendlineEvents(touches={10}, breakouts=set(), throwbacks={20, 40},
+                                            false_breakouts=set()))
+    np.testing.assert_array_equal(EntrySchedule.from_lines([line], [], event_window=3).entry_idx, [23, 43])
+    np.testing.assert_array_equal(
+        EntrySchedule.from_lines([line], [], event_window=3, confirm_window=5).entry_idx, [25, 45])
@@ -0,0 +1,32 @@
+import os
+import numpy as np
+from src.csv_loader import read_ohlc
+from src.utils import load_data
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_CSV = os.path.join(HERE, 'data.csv')
+TRADINGVIEW_CSV = os.path.join(HERE, 'NSE_KALYANKJIL, 5.csv')
+
+def test_epoch_of_known_rows():
+    # 19/05/23 9:16 and 2024-12-26T03:45:00Z, both UTC
+    assert read_ohlc(DATA_CSV)['epoch'].iloc[0] == 1684487760
+    assert read_ohlc(TRADINGVIEW_CSV)['epoch'].iloc[0] == 1735184700
+
+def test_time_text_column_dropped_unless_kept():
+    assert 'timestamp' not in read_ohlc(DATA_CSV).columns
+    assert 'timestamp' in read_ohlc(DATA_CSV, keep_time=True).columns
+
+def test_start_end_filter_with_dates_and_epochs():
+    full = read_ohlc(DATA_CSV)
+    by_date = load_data(DATA_CSV, start='2023-05-19 09:20', end='2023-05-19 09:30')
+    expected = full[(full['epoch'] >= 1684488000) & (full['epoch'] <= 1684488600)]
+    assert len(by_date) == 11
+    np.testing.assert_array_equal(by_date['close'], expected['close'])
+
+    by_epoch = load_data(DATA_CSV, start=1684488000, end=1684488600)
+    np.testing.assert_array_equal(by_epoch['epoch'], by_date['epoch'])
+
+def test_chunked_read_matches_single_read():
+    whole = read_ohlc(TRADINGVIEW_CSV)
+    chunked = read_ohlc(TRADINGVIEW_CSV, chunksize=7)
+    assert whole.equals(chunked)
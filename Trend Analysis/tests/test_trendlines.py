@@ -0,0 +1,111 @@
+import json
+import os
+import numpy as np
+import pytest
+from src.utils import load_data, calculate_atr, ATRState
+from src.pivot_detection import get_pivot_points, PivotStream
+from src.trendline_detection import (simple_trendlines, hough_transform_trendlines, hough_candidates,
+                                     score_hough_candidates, filter_hough_lines)
+from src.trendline_events import detect_events, detect_events_batch
+from src.price_context import PriceContext
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_CSV = os.path.join(os.path.dirname(HERE), 'data.csv')
+
+# Output of the original (loop-based) implementation on data.csv
+with open(os.path.join(HERE, 'expected', 'data_csv_trendlines.json')) as f:
+    EXPECTED = json.load(f)
+EVENT_KINDS = ('touches', 'breakouts', 'throwbacks', 'false_breakouts')
+SIDES = (('support', True), ('resistance', False))
+
+@pytest.fixture
+def data():
+    df = load_data(DATA_CSV)
+    high_pivots, low_pivots = get_pivot_points(df, window=EXPECTED['window'])
+    return df, high_pivots, low_pivots
+
+def assert_events_equal(events, expected):
+    for kind in EVENT_KINDS:
+        assert sorted(getattr(events, kind)) == expected[kind], kind
+
+def assert_lines_equal(lines, expected):
+    assert len(lines) == len(expected)
+    for (slope, intercept, start, events), record in zip(lines, expected):
+        assert slope == pytest.approx(record['slope'], rel=1e-9)
+        assert intercept == pytest.approx(record['intercept'], rel=1e-9)
+        assert start == record['start']
+        assert_events_equal(events, record)
+
+def test_pivots(data):
+    _, high_pivots, low_pivots = data
+    assert high_pivots.tolist() == EXPECTED['high_pivots']
+    assert low_pivots.tolist() == EXPECTED['low_pivots']
+
+@pytest.mark.parametrize('side, is_support', SIDES)
+def test_simple_trendlines(data, side, is_support):
+    df, high_pivots, low_pivots = data
+    pivots = low_pivots if is_support else high_pivots
+    lines = simple_trendlines(pivots, df, is_support, high_pivots, low_pivots,
+                              atr_multiplier=EXPECTED['atr_multiplier'])
+    assert_lines_equal(lines, EXPECTED[f'simple_{side}'])
+
+@pytest.mark.parametrize('side, is_support', SIDES)
+def test_hough_transform_trendlines(data, side, is_support):
+    df, high_pivots, low_pivots = data
+    pivots = low_pivots if is_support else high_pivots
+    lines = hough_transform_trendlines(pivots, df, is_support, high_pivots, low_pivots,
+                                       future_pivot_ranges=EXPECTED['future_pivot_ranges'],
+                                       min_score=EXPECTED['min_score'],
+                                       atr_multiplier=EXPECTED['atr_multiplier'])
+    assert_lines_equal(lines, EXPECTED[f'hough_{side}'])
+
+@pytest.mark.parametrize('side, is_support', SIDES)
+def test_hough_stages_without_context(data, side, is_support):
+    df, high_pivots, low_pivots = data
+    pivots = low_pivots if is_support else high_pivots
+    candidates = hough_candidates(pivots, df['close'].to_numpy(), high_pivots, low_pivots,
+                                  EXPECTED['future_pivot_ranges'])
+    scored = score_hough_candidates(candidates, pivots, df, is_support, EXPECTED['atr_multiplier'],
+                                    high_pivots=high_pivots, low_pivots=low_pivots)
+    assert_lines_equal(filter_hough_lines(scored, EXPECTED['min_score']), EXPECTED[f'hough_{side}'])
+
+@pytest.mark.parametrize('side, is_support', SIDES)
+def test_detect_events_single_and_batch(data, side, is_support):
+    df, high_pivots, low_pivots = data
+    df['atr'] = calculate_atr(df)
+    ctx = PriceContext.from_df(df, high_pivots, low_pivots)
+    expected = EXPECTED[f'simple_{side}'] + EXPECTED[f'hough_{side}']
+    lines = [(record['slope'], record['intercept'], record['start']) for record in expected]
+
+    batch = detect_events_batch(lines, ctx, is_support, EXPECTED['atr_multiplier'])
+    for line, events, record in zip(lines, batch, expected):
+        assert_events_equal(detect_events(line, df, high_pivots, low_pivots, is_support,
+                                          EXPECTED['atr_multiplier']), record)
+        assert_events_equal(events, record)
+
+def test_pivot_stream_matches_get_pivot_points(data):
+    df, high_pivots, low_pivots = data
+    stream = PivotStream(window=EXPECTED['window'])
+    for close in df['close']:
+        stream.update(close)
+    stream_high, stream_low = stream.pivot_points(include_unconfirmed=True)
+    np.testing.assert_array_equal(np.sort(stream_high), high_pivots)
+    np.testing.assert_array_equal(np.sort(stream_low), low_pivots)
+
+def test_atr_state_matches_calculate_atr(data):
+    df, _, _ = data
+    period = EXPECTED['atr_period']
+    expected = calculate_atr(df, period).to_numpy()
+    state = ATRState(period)
+    values = np.array([state.update(high, low, close)
+                       for high, low, close in zip(df['high'], df['low'], df['close'])])
+    assert np.isnan(values[:period - 1]).all()
+    np.testing.assert_allclose(values[period - 1:], expected[period - 1:], rtol=1e-12)
+    assert state.first_atr == pytest.approx(expected[0], rel=1e-12)
+
+    # Seeded from the first half, then continued bar by bar
+    half = len(df) // 2
+    seeded = ATRState.from_df(df.iloc[:half], period)
+    for i in range(half, len(df)):
+        seeded.update(df['high'].iloc[i], df['low'].iloc[i], df['close'].iloc[i])
+    assert seeded.atr == pytest.approx(expected[-1], rel=1e-12)
@@ -0,0 +1,42 @@
+import argparse
+import pandas as pd
+from src.pipeline import add_config_arguments, config_from_args
+from src.walk_forward import run_walk_forward
+from src.utils import load_data
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Walk-forward trend analysis: train on a rolling window, trade the next bars")
+    parser.add_argument('input', help="CSV file")
+    parser.add_argument('--train', type=int, required=True, help="Bars in each train segment")
+    parser.add_argument('--test', type=int, required=True, help="Bars in each test segment")
+    parser.add_argument('--step', type=int, default=None, help="Bars between folds (default: --test)")
+    parser.add_argument('-o', '--output', default=None, help="Write the trade table to this CSV file")
+    add_config_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config = config_from_args(args)
+
+    result = run_walk_forward(load_data(args.input), args.train, args.test, args.step, config)
+    folds = result['folds']
+    if folds.empty:
+        print("Not enough bars for one train and test segment.")
+        return
+
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(folds.to_string(index=False))
+
+    stats = result['trade_stats']
+    if stats:
+        print(f"\nAll folds: {len(stats['trades'])} trades, win rate {stats['win_rate']:.1f}%, "
+              f"P/L ${stats['total_pnl']:.2f}")
+    else:
+        print("\nNo trades in any test segment.")
+
+    if args.output:
+        result['trades'].to_csv(args.output, index=False)
+        print(f"Trades written to {args.output}")
+
+if __name__ == "__main__":
+    main()